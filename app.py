@@ -1,6 +1,8 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from controller import service_controller
+from controller import model_registry, service_controller, training_jobs
+from weather import exogenous
+from weather.dwd_client import DWDUnavailableError
 import logging, sys
 
 app = Flask(__name__)
@@ -18,6 +20,32 @@ logging.basicConfig(
     ]
 )
 
+def weather_parameters() -> tuple[str, str]:
+    """
+    weather capability and column of a request, lists of capabilities and columns select multiple weather columns
+    :return: capability and column as used by the service
+    """
+    capability, column = exogenous.join_features(request.json["weatherCapability"], request.json["weatherColumn"])
+
+    # validated while answering the request, training jobs would only fail in the worker
+    exogenous.parse_features(capability, column)
+
+    return capability, column
+
+@app.errorhandler(exogenous.FeatureError)
+def handle_feature_error(error: exogenous.FeatureError):
+    """
+    answer requests with invalid weather capabilities and columns with 400
+    """
+    return jsonify(str(error)), 400
+
+@app.errorhandler(DWDUnavailableError)
+def handle_dwd_unavailable(error: DWDUnavailableError):
+    """
+    answer requests depending on DWD with 503 while it can not be reached
+    """
+    return jsonify(str(error)), 503
+
 @app.route(f"{prefix}/helloworld", methods=["GET"])
 def hello_world():
     return jsonify("Hello, World!")
@@ -26,6 +54,14 @@ def hello_world():
 def request_meter_names():
     return jsonify(service_controller.get_meter_names())
 
+@app.route(f"{prefix}/serviceStats", methods=["GET"])
+def request_service_stats():
+    """
+    counters of the caches used by the service
+    :return: dict of stats per component
+    """
+    return jsonify(service_controller.get_service_stats())
+
 @app.route(f"{prefix}/weatherCapabilities", methods=["GET"])
 def request_weather_capabilities():
     resp = jsonify(service_controller.get_weather_capabilities(True))
@@ -57,19 +93,223 @@ def single_smartmeter():
 @app.route(f"{prefix}/trainModel", methods=["POST"])
 def train_model_on_smartmeter():
     """
-    get data of a chosen smartmeter and chosen timely frame
-    :return: predicted values with conf_intervals
+    enqueue the training of a model on a chosen smartmeter and chosen timely frame
+    :return: id of the queued training job
+    """
+
+    try:
+        job_id = training_jobs.submit_job("train",
+                                          request.json["name"],
+                                          service_controller.train_model,
+                                          request.json["name"],
+                                          request.json["timeframe"],
+                                          request.json["resolution"],
+                                          request.json["startpoint"],
+                                          *weather_parameters(),
+                                          request.json.get("fullSearch", False)
+                                          )
+    except training_jobs.QueueFullError as e:
+        return jsonify(str(e)), 503
+
+    return jsonify({"jobId": job_id, "status": "queued"}), 202
+
+
+@app.route(f"{prefix}/updateModel", methods=["POST"])
+def update_model_on_smartmeter():
+    """
+    enqueue appending the newest observations to a saved model without a new order search
+    :return: id of the queued update job
+    """
+
+    try:
+        job_id = training_jobs.submit_job("update",
+                                          request.json["name"],
+                                          service_controller.update_model,
+                                          request.json["name"],
+                                          request.json["timeframe"],
+                                          request.json["resolution"],
+                                          request.json["startpoint"],
+                                          *weather_parameters(),
+                                          request.json.get("until")
+                                          )
+    except training_jobs.QueueFullError as e:
+        return jsonify(str(e)), 503
+
+    return jsonify({"jobId": job_id, "status": "queued"}), 202
+
+
+@app.route(f"{prefix}/trainModels", methods=["POST"])
+def train_models_on_smartmeters():
     """
+    enqueue the training of multiple smartmeters ("all" for every smartmeter) sharing one configuration
+    :return: batch id, job ids per smartmeter and smartmeters which could not be queued
+    """
+
+    data = service_controller.train_models(request.json["names"],
+                                           request.json["timeframe"],
+                                           request.json["resolution"],
+                                           request.json["startpoint"],
+                                           *weather_parameters(),
+                                           request.json.get("fullSearch", False)
+                                           )
 
-    service_controller.train_model(request.json["name"],
-                                   request.json["timeframe"],
-                                   request.json["resolution"],
-                                   request.json["startpoint"],
-                                   request.json["weatherCapability"],
-                                   request.json["weatherColumn"]
-                                   )
+    return jsonify(data), 202
 
-    return jsonify("Model saved")
+
+@app.route(f"{prefix}/trainingBatches/<batch_id>", methods=["GET"])
+def request_training_batch(batch_id: str):
+    """
+    status of every training job of a batch
+    :return: list of job information
+    """
+
+    data = training_jobs.get_batch(batch_id)
+    if data is None:
+        return jsonify(f"Unknown batch {batch_id}"), 404
+
+    return jsonify(data)
+
+
+@app.route(f"{prefix}/trainingJobs", methods=["GET"])
+def request_training_jobs():
+    """
+    status of all known training jobs
+    :return: list of job information
+    """
+    return jsonify(training_jobs.get_jobs())
+
+
+@app.route(f"{prefix}/trainingJobs/<job_id>", methods=["GET"])
+def request_training_job(job_id: str):
+    """
+    status of a single training job
+    :return: job information (queued/running/done/failed/cancelled, duration, model key)
+    """
+
+    data = training_jobs.get_job(job_id)
+    if data is None:
+        return jsonify(f"Unknown job {job_id}"), 404
+
+    return jsonify(data)
+
+
+@app.route(f"{prefix}/trainingJobs/<job_id>/result", methods=["GET"])
+def request_training_job_result(job_id: str):
+    """
+    result of a finished training job
+    :return: result of the job, 409 if the job is not done
+    """
+
+    data = training_jobs.get_job(job_id)
+    if data is None:
+        return jsonify(f"Unknown job {job_id}"), 404
+    if data["status"] != "done":
+        return jsonify(data), 409
+
+    return jsonify(training_jobs.get_job_result(job_id))
+
+
+@app.route(f"{prefix}/trainingJobs/<job_id>", methods=["DELETE"])
+def cancel_training_job(job_id: str):
+    """
+    cancel a training job which has not been started yet
+    :return: job information, 409 if the job could not be cancelled
+    """
+
+    if training_jobs.get_job(job_id) is None:
+        return jsonify(f"Unknown job {job_id}"), 404
+
+    cancelled = training_jobs.cancel_job(job_id)
+    data = training_jobs.get_job(job_id)
+
+    return jsonify(data), 200 if cancelled else 409
+
+
+@app.route(f"{prefix}/backtests", methods=["POST"])
+def backtest_smartmeter():
+    """
+    enqueue a rolling origin backtest of a smartmeter configuration
+    :return: id of the queued job, its result is the id of the stored backtest
+    """
+
+    try:
+        job_id = training_jobs.submit_job("backtest",
+                                          request.json["name"],
+                                          service_controller.run_backtest,
+                                          request.json["name"],
+                                          request.json["timeframe"],
+                                          request.json["resolution"],
+                                          request.json["startpoint"],
+                                          *weather_parameters(),
+                                          request.json.get("nCutoffs", 10),
+                                          request.json.get("horizon", 24),
+                                          request.json.get("step")
+                                          )
+    except training_jobs.QueueFullError as e:
+        return jsonify(str(e)), 503
+
+    return jsonify({"jobId": job_id, "status": "queued"}), 202
+
+
+@app.route(f"{prefix}/weatherScreening", methods=["POST"])
+def screen_weather_columns():
+    """
+    enqueue ranking the weather columns of the catalog by their error gain for a smartmeter
+    :return: id of the queued job, its result is the ranking
+    """
+
+    try:
+        job_id = training_jobs.submit_job("screening",
+                                          request.json["name"],
+                                          service_controller.run_weather_screening,
+                                          request.json["name"],
+                                          request.json["timeframe"],
+                                          request.json["resolution"],
+                                          request.json["startpoint"],
+                                          request.json.get("holdout", 24),
+                                          request.json.get("capabilities")
+                                          )
+    except training_jobs.QueueFullError as e:
+        return jsonify(str(e)), 503
+
+    return jsonify({"jobId": job_id, "status": "queued"}), 202
+
+
+@app.route(f"{prefix}/backtests", methods=["GET"])
+def request_backtests():
+    """
+    stored backtests without their results, optionally of one smartmeter (?name=)
+    :return: list of backtests, newest first
+    """
+    return jsonify(service_controller.get_backtests(request.args.get("name")))
+
+
+@app.route(f"{prefix}/backtests/<backtest_id>", methods=["GET"])
+def request_backtest(backtest_id: str):
+    """
+    metrics per horizon step, forecasts and actuals of a stored backtest
+    :return: backtest including its results
+    """
+
+    data = service_controller.get_backtest(backtest_id)
+    if data is None:
+        return jsonify(f"Unknown backtest {backtest_id}"), 404
+
+    return jsonify(data)
+
+
+@app.route(f"{prefix}/models", methods=["GET"])
+def request_models():
+    """
+    saved models of the model registry, filtered by the query parameters
+    (name, timeframe, resolution, startPoint, capability, column, limit)
+    :return: list of model metadata, newest first
+    """
+
+    filters = {key: value for key, value in request.args.items() if key in model_registry.FILTERS}
+    limit = request.args.get("limit", type=int)
+
+    return jsonify(service_controller.get_models(filters, limit))
 
 
 @app.route(f"{prefix}/loadModelAndPredict", methods=["POST"])
@@ -79,14 +319,40 @@ def pred_from_model():
     :return: predicted values with conf_intervals
     """
 
-    data = service_controller.forecast(request.json["name"],
-                                       request.json["timeframe"],
-                                       request.json["resolution"],
-                                       request.json["startpoint"],
-                                       request.json["weatherCapability"],
-                                       request.json["weatherColumn"]
-                                       )
+    try:
+        data = service_controller.forecast(request.json["name"],
+                                           request.json["timeframe"],
+                                           request.json["resolution"],
+                                           request.json["startpoint"],
+                                           *weather_parameters(),
+                                           request.json.get("nPeriods", 24)
+                                           )
+    except ValueError as e:
+        return jsonify(str(e)), 400
+
+    return jsonify(data)
+
+
+@app.route(f"{prefix}/forecasts", methods=["POST"])
+def pred_from_models():
+    """
+    forecast many smartmeters sharing one configuration in one request
+    :return: columnar forecasts with a row per smartmeter and period, smartmeters which failed
+    """
+
+    try:
+        data = service_controller.forecast_meters(request.json["names"],
+                                                  request.json["timeframe"],
+                                                  request.json["resolution"],
+                                                  request.json["startpoint"],
+                                                  *weather_parameters(),
+                                                  request.json.get("nPeriods", 24)
+                                                  )
+    except ValueError as e:
+        return jsonify(str(e)), 400
+
     return jsonify(data)
 
 if __name__ == "__main__":
+    service_controller.start_background_tasks()
     app.run(host="0.0.0.0",port=8090, debug=False, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+benchmark of the training and forecasting pipeline on synthetic smartmeter data,
+no database or dwd access is needed
+
+usage: python -m benchmarks.benchmark --lengths "one week" "one month" --resolutions hourly daily --output bench.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# service_controller reads the dwd api on import, it is never requested by the benchmark
+os.environ.setdefault("DWD_API_V1", "http://localhost")
+os.environ.setdefault("WEATHER_STATION", "/00000")
+
+from controller import model_format, service_controller
+from forecasting import data_forecast, model_training
+
+LENGTHS = ["one week", "one month", "three months", "six months", "one year", "all"]
+RESOLUTIONS = ["hourly", "daily", "weekly"]
+START_DATE = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def create_series(timeframe: str, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    synthetic hourly water demand with daily and weekly seasonality and a matching temperature
+
+    :param timeframe: timeframe as used by the service (one week, ..., all)
+    :param seed: seed of the random noise
+    :return: df of date and value, df of the exogenous temperature
+    """
+
+    end_date = service_controller.create_end_date(timeframe, START_DATE)
+    dates = pd.date_range(START_DATE, end_date, freq="h")
+    hours = np.arange(len(dates))
+    rng = np.random.default_rng(seed)
+
+    temperature = (10 + 8 * np.sin(2 * np.pi * (hours / (24 * 365.25) - 0.25))
+                   + 4 * np.sin(2 * np.pi * (hours / 24 - 0.375)) + rng.normal(0, 1, len(hours)))
+
+    daily = np.sin(2 * np.pi * hours / 24) + 0.5 * np.sin(4 * np.pi * hours / 24)
+    weekly = 0.3 * (dates.dayofweek >= 5)
+    value = 1.5 + 0.4 * daily + weekly + 0.02 * temperature + rng.normal(0, 0.1, len(hours))
+
+    return (pd.DataFrame({"date": dates.to_pydatetime(), "value": value}),
+            pd.DataFrame({"TT_TU": temperature}))
+
+
+def run_case(timeframe: str, resolution: str, weather: bool, n_periods: int, seed: int) -> dict[str, Any]:
+    """
+    time every stage of one configuration, executed in its own process so peak rss is not shared
+
+    :param timeframe: length of the series
+    :param resolution: resolution of the trained data
+    :param weather: train with the exogenous temperature
+    :param n_periods: periods to forecast
+    :param seed: seed of the series
+    :return: dict of stage results
+    """
+
+    stages: dict[str, dict[str, float]] = {}
+
+    def measure(stage: str, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        stages[stage] = {"wallTime": time.perf_counter() - start, "peakRssMb": __peak_rss_mb()}
+        return result
+
+    df, weather_df = measure("generate", create_series, timeframe, seed)
+
+    data = {"date": list(df["date"]), "value": list(df["value"])}
+    resampled = measure("resample", getattr(service_controller, "__resample_data"), data, resolution)
+    values = pd.DataFrame({"value": resampled["value"]})
+
+    exogenous, future_exogenous = None, None
+    if weather:
+        # weather is hourly, take the mean per resampled bucket to keep the rows aligned
+        weather_series = pd.Series(weather_df["TT_TU"].to_numpy(), index=pd.DatetimeIndex(df["date"]))
+        weather_series = weather_series.resample(__pandas_frequency(resolution)).mean()
+        exogenous = pd.DataFrame({"TT_TU": weather_series.to_numpy()})
+        future_exogenous = pd.DataFrame({"TT_TU": np.resize(exogenous["TT_TU"].to_numpy(), n_periods)})
+
+    model, _ = measure("train", model_training.train_model, values, exogenous)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "model.pkl")
+        model_dict = {"model": model, "training_time": 0.0, "start_date": START_DATE, "end_date": START_DATE}
+
+        measure("save", model_format.write, path, model_dict)
+        model_size = os.path.getsize(path)
+        measure("load", model_format.read, path)
+
+    measure("forecast", data_forecast.create_forecast_data, model, n_periods, future_exogenous)
+
+    return {
+        "timeframe": timeframe,
+        "resolution": resolution,
+        "weather": weather,
+        "observations": len(df),
+        "trainedObservations": len(values),
+        "order": list(model.order),
+        "seasonalOrder": list(model.seasonal_order),
+        "modelFileBytes": model_size,
+        "stages": stages,
+    }
+
+
+def main() -> None:
+    """
+    run every combination of lengths and resolutions and write the results as json
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", nargs="+", default=LENGTHS[:3], choices=LENGTHS)
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS, choices=RESOLUTIONS)
+    parser.add_argument("--weather", action="store_true", help="train with an exogenous temperature column")
+    parser.add_argument("--periods", type=int, default=24, help="periods to forecast")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the json report to, stdout if omitted")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    for timeframe in args.lengths:
+        for resolution in args.resolutions:
+            with context.Pool(1, initializer=__init_worker) as pool:
+                try:
+                    result = pool.apply(run_case, (timeframe, resolution, args.weather, args.periods, args.seed))
+                except Exception as e:
+                    # e.g. too few observations for a seasonal model at weekly resolution
+                    result = {"timeframe": timeframe, "resolution": resolution, "weather": args.weather,
+                              "error": str(e)}
+
+            results.append(result)
+            print(f"{timeframe} {resolution}: {result.get('stages', result.get('error'))}", file=sys.stderr)
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+def __init_worker() -> None:
+    """
+    keep stdout free for the json report, the training trace is written to stderr
+    """
+
+    sys.stdout = sys.stderr
+
+
+def __pandas_frequency(resolution: str) -> str:
+    """
+    :param resolution: hourly, daily or weekly
+    :return: pandas frequency used by the service for the resolution
+    """
+
+    return {"hourly": "h", "daily": "D", "weekly": "7D"}[resolution]
+
+
+def __peak_rss_mb() -> float:
+    """
+    :return: peak resident set size of the current process in MB
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macOS, kilobytes on linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    main()
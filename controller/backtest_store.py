@@ -0,0 +1,92 @@
+import datetime
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from dotenv import load_dotenv
+from root_file import ROOT_DIR
+
+
+def save_backtest(name: str, config: dict[str, Any], result: dict[str, Any]) -> str:
+    """
+    persist the result of a backtest
+
+    :param name: smartmeter name
+    :param config: parameters of the backtest
+    :param result: metrics and forecasts of the backtest
+    :return: id of the stored backtest
+    """
+
+    backtest_id = uuid.uuid4().hex
+
+    with __connect() as connection:
+        connection.execute("INSERT INTO backtests (id, name, created, config, result) VALUES (?, ?, ?, ?, ?)",
+                           (backtest_id, name, datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                            json.dumps(config), json.dumps(result)))
+
+    return backtest_id
+
+
+def get_backtest(backtest_id: str) -> dict[str, Any] | None:
+    """
+    stored backtest including its results
+
+    :param backtest_id: id of the backtest
+    :return: dict of id, name, created, config and result or None if unknown
+    """
+
+    with __connect() as connection:
+        row = connection.execute("SELECT id, name, created, config, result FROM backtests WHERE id=?",
+                                 (backtest_id,)).fetchone()
+
+    if row is None:
+        return None
+
+    return {"id": row[0], "name": row[1], "created": row[2], "config": json.loads(row[3]), "result": json.loads(row[4])}
+
+
+def get_backtests(name: str | None = None) -> list[dict[str, Any]]:
+    """
+    stored backtests without their results, newest first
+
+    :param name: only backtests of this smartmeter, all if None
+    :return: list of id, name, created and config
+    """
+
+    query_string = "SELECT id, name, created, config FROM backtests"
+    params: tuple = ()
+    if name is not None:
+        query_string += " WHERE name=?"
+        params = (name,)
+
+    with __connect() as connection:
+        rows = connection.execute(query_string + " ORDER BY created DESC", params).fetchall()
+
+    return [{"id": row[0], "name": row[1], "created": row[2], "config": json.loads(row[3])} for row in rows]
+
+
+@contextmanager
+def __connect() -> Iterator[sqlite3.Connection]:
+    """
+    open the backtest database (FILE_PATH_RESULTS/backtests.sqlite)
+
+    :return: sqlite connection, committed and closed afterwards
+    """
+
+    load_dotenv()
+    folder = os.path.join(ROOT_DIR, os.getenv("FILE_PATH_RESULTS") or "files/results")
+    os.makedirs(folder, exist_ok=True)
+
+    connection = sqlite3.connect(os.path.join(folder, "backtests.sqlite"), timeout=30)
+
+    try:
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS backtests (id TEXT PRIMARY KEY, name TEXT NOT NULL, "
+                               "created TEXT NOT NULL, config TEXT NOT NULL, result TEXT NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS backtests_name_idx ON backtests (name, created)")
+            yield connection
+    finally:
+        connection.close()
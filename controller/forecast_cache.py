@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from dotenv import load_dotenv
+
+import interfaces
+from root_file import ROOT_DIR
+
+# key -> (creation time, (mtime, size) of the model file, forecast)
+__entries: OrderedDict[tuple, tuple[float, tuple[int, int], interfaces.ForecastData]] = OrderedDict()
+__stats = {"hits": 0, "diskHits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+__lock = threading.Lock()
+
+
+def get(key: tuple, model_stamp: tuple[int, int] | None) -> interfaces.ForecastData | None:
+    """
+    return a cached forecast if it is younger than FORECAST_CACHE_TTL and the model did not change,
+    the disk tier is checked when the forecast is not kept in memory
+
+    :param key: parameters identifying the forecast
+    :param model_stamp: (mtime, size) of the model file the forecast is based on
+    :return: forecast or None on a miss
+    """
+
+    ttl, max_entries, folder = __read_config()
+
+    if model_stamp is None or max_entries <= 0:
+        return None
+
+    with __lock:
+        entry = __entries.get(key)
+        source = "hits"
+
+        if entry is None and folder:
+            entry = __read_file(folder, key)
+            source = "diskHits"
+
+        if entry is not None:
+            created, entry_stamp, data = entry
+
+            if entry_stamp != model_stamp:
+                __stats["invalidations"] += 1
+                __remove(key, folder)
+            elif time.time() - created > ttl:
+                __stats["expired"] += 1
+                __remove(key, folder)
+            else:
+                __stats[source] += 1
+                __store(key, entry, max_entries)
+                return data
+
+        __stats["misses"] += 1
+
+    return None
+
+
+def put(key: tuple, model_stamp: tuple[int, int] | None, data: interfaces.ForecastData) -> None:
+    """
+    cache an assembled forecast in memory and, if FILE_PATH_FORECAST_CACHE is set, on disk
+
+    :param key: parameters identifying the forecast
+    :param model_stamp: (mtime, size) of the model file the forecast is based on
+    :param data: forecast to cache
+    """
+
+    _, max_entries, folder = __read_config()
+
+    if model_stamp is None or max_entries <= 0:
+        return
+
+    entry = (time.time(), tuple(model_stamp), data)
+
+    with __lock:
+        __store(key, entry, max_entries)
+
+    if folder:
+        __write_file(folder, key, entry)
+
+
+def get_stats() -> dict[str, Any]:
+    """
+    counters and usage of the forecast cache
+
+    :return: dict of hits, disk hits, misses, expired, invalidations and entries
+    """
+
+    with __lock:
+        return {**__stats, "entries": len(__entries)}
+
+
+def __store(key: tuple, entry: tuple, max_entries: int) -> None:
+    """
+    insert an entry as most recently used and evict the oldest, lock must be held
+
+    :param key: parameters identifying the forecast
+    :param entry: cached entry
+    :param max_entries: limit of entries kept in memory
+    """
+
+    __entries[key] = entry
+    __entries.move_to_end(key)
+
+    while len(__entries) > max_entries:
+        __entries.popitem(last=False)
+
+
+def __remove(key: tuple, folder: str | None) -> None:
+    """
+    remove an outdated entry from memory and disk, lock must be held
+
+    :param key: parameters identifying the forecast
+    :param folder: folder of the disk tier, None if disabled
+    """
+
+    __entries.pop(key, None)
+
+    if folder:
+        try:
+            os.remove(__file_of(folder, key))
+        except OSError:
+            pass
+
+
+def __read_file(folder: str, key: tuple) -> tuple | None:
+    """
+    read an entry of the disk tier
+
+    :param folder: folder of the disk tier
+    :param key: parameters identifying the forecast
+    :return: cached entry or None if missing or unreadable
+    """
+
+    path = __file_of(folder, key)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r") as file:
+            content = json.load(file)
+        return content["created"], tuple(content["modelStamp"]), content["data"]
+    except Exception as e:
+        logging.debug(f"Reading cached forecast {path} failed: {e}")
+        return None
+
+
+def __write_file(folder: str, key: tuple, entry: tuple) -> None:
+    """
+    write an entry to the disk tier, replaced atomically so readers never see partial files
+
+    :param folder: folder of the disk tier
+    :param key: parameters identifying the forecast
+    :param entry: cached entry
+    """
+
+    path = __file_of(folder, key)
+    created, model_stamp, data = entry
+
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(f"{path}.tmp", "w") as file:
+            json.dump({"key": list(key), "created": created, "modelStamp": list(model_stamp), "data": data}, file)
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        logging.debug(f"Writing cached forecast {path} failed: {e}")
+
+
+def __file_of(folder: str, key: tuple) -> str:
+    """
+    :param folder: folder of the disk tier
+    :param key: parameters identifying the forecast
+    :return: path of the cache file of the key
+    """
+
+    digest = hashlib.sha1(json.dumps(list(key)).encode()).hexdigest()
+
+    return os.path.join(folder, f"{digest}.json")
+
+
+def __read_config() -> tuple[float, int, str | None]:
+    """
+    read FORECAST_CACHE_TTL, FORECAST_CACHE_MAX_ENTRIES and FILE_PATH_FORECAST_CACHE
+
+    :return: ttl in seconds, maximum of entries in memory, folder of the disk tier or None
+    """
+
+    load_dotenv()
+    ttl = os.getenv("FORECAST_CACHE_TTL")
+    max_entries = os.getenv("FORECAST_CACHE_MAX_ENTRIES")
+    folder = os.getenv("FILE_PATH_FORECAST_CACHE")
+
+    return (float(ttl) if ttl else 300.0,
+            int(max_entries) if max_entries else 256,
+            os.path.join(ROOT_DIR, folder) if folder else None)
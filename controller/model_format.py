@@ -0,0 +1,210 @@
+import datetime
+import json
+import lzma
+import os
+import pickle
+import tempfile
+import warnings
+import zlib
+from typing import Any
+
+import joblib
+import pmdarima as pm
+from dotenv import load_dotenv
+from pmdarima.compat.statsmodels import bind_df_model
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+import interfaces
+
+# file layout: MAGIC, length of the header (4 bytes, big endian), json header, body compressed with the header's codec
+MAGIC = b"WDMODEL1"
+
+# body of a model file: "state" holds the estimator attributes, the fitted parameters, the sarimax specification and
+# the observations the state space is filtered on when reading, "pickle" holds the whole pickled model
+# (written before "state" existed, the filter results are stored per observation and make up almost all of the file)
+PAYLOADS = ["state", "pickle"]
+
+# read once while importing, os.umask can only be read by setting it, which is not thread safe later on
+__umask = os.umask(0)
+os.umask(__umask)
+
+CODECS = {
+    "none": (lambda data: data, lambda data: data),
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset=1), lzma.decompress),
+}
+
+
+def write(path: str, model_dict: interfaces.ModelInfoDict) -> dict[str, Any]:
+    """
+    write a model with its metadata header, the body is compressed with MODEL_CODEC (zlib, lzma or none).
+    The file is written to a temporary file and renamed, readers never see a partially written model
+
+    :param path: path of the model file
+    :param model_dict: model, training time, start and end date
+    :return: written header
+    """
+
+    load_dotenv()
+    codec = os.getenv("MODEL_CODEC") or "zlib"
+
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported model codec {codec}")
+
+    model = model_dict["model"]
+    payload = "state" if isinstance(model, pm.ARIMA) else "pickle"
+    header = {
+        "codec": codec,
+        "payload": payload,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "startDate": __to_iso(model_dict["start_date"]),
+        "endDate": __to_iso(model_dict["end_date"]),
+        "trainingTime": model_dict["training_time"],
+        "order": list(model.order),
+        "seasonalOrder": list(model.seasonal_order),
+        "aic": float(model.aic()),
+        "nobs": int(model.arima_res_.nobs),
+    }
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    compress, _ = CODECS[codec]
+    body = compress(pickle.dumps(__pack_state(model) if payload == "state" else model,
+                                 protocol=pickle.HIGHEST_PROTOCOL))
+
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+
+    try:
+        # mkstemp creates the file readable by the owner only, model files are created like with open()
+        os.fchmod(descriptor, 0o666 & ~__umask)
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(MAGIC)
+            file.write(len(header_bytes).to_bytes(4, "big"))
+            file.write(header_bytes)
+            file.write(body)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return header
+
+
+def read(path: str) -> interfaces.ModelInfoDict:
+    """
+    read a model file, files saved with joblib before the header format are still loaded
+
+    :param path: path of the model file
+    :return: model, training time, start and end date
+    """
+
+    with open(path, "rb") as file:
+        header = __read_header(file)
+
+        if header is None:
+            return joblib.load(path)
+
+        _, decompress = CODECS[header["codec"]]
+        model = pickle.loads(decompress(file.read()))
+
+    if header.get("payload", "pickle") == "state":
+        model = __unpack_state(model)
+
+    return {
+        "model": model,
+        "training_time": header["trainingTime"],
+        "start_date": __from_iso(header["startDate"]),
+        "end_date": __from_iso(header["endDate"]),
+    }
+
+
+def read_metadata(path: str) -> dict[str, Any] | None:
+    """
+    read only the header of a model file, the model itself is not deserialized
+
+    :param path: path of the model file
+    :return: header (codec, dates, training time, orders, aic, nobs) or None for files saved with joblib
+    """
+
+    with open(path, "rb") as file:
+        return __read_header(file)
+
+
+def __read_header(file) -> dict[str, Any] | None:
+    """
+    :param file: model file opened in binary mode at its beginning
+    :return: parsed header with the file positioned at the body, None if the file has no header
+    """
+
+    if file.read(len(MAGIC)) != MAGIC:
+        file.seek(0)
+        return None
+
+    length = int.from_bytes(file.read(4), "big")
+
+    return json.loads(file.read(length).decode("utf-8"))
+
+
+def __pack_state(model: pm.ARIMA) -> dict[str, Any]:
+    """
+    split a fitted model into what is needed to restore it,
+    the state space results are left out and recomputed by one filter pass on read
+
+    :param model: fitted model
+    :return: estimator attributes, sarimax specification, fitted parameters and observations
+    """
+
+    results = model.arima_res_
+
+    return {
+        "attributes": {key: value for key, value in vars(model).items() if key != "arima_res_"},
+        "specification": results.model._get_init_kwds(),
+        "params": results.params,
+        "endog": results.model.data.orig_endog,
+        "exog": results.model.data.orig_exog,
+    }
+
+
+def __unpack_state(state: dict[str, Any]) -> pm.ARIMA:
+    """
+    restore a model of __pack_state, filtering with the fitted parameters does not search or optimize,
+    forecasts and update() behave like the model before saving
+
+    :param state: packed model
+    :return: fitted model
+    """
+
+    model = pm.ARIMA.__new__(pm.ARIMA)
+    model.__dict__.update(state["attributes"])
+
+    with warnings.catch_warnings():
+        if model.suppress_warnings:
+            warnings.simplefilter("ignore")
+
+        sarimax = SARIMAX(state["endog"], exog=state["exog"], **state["specification"])
+        results = sarimax.filter(state["params"])
+
+    bind_df_model(sarimax, results)
+    model.arima_res_ = results
+
+    return model
+
+
+def __to_iso(date: datetime.datetime | str | None) -> str | None:
+    """
+    :param date: date of the model dict
+    :return: iso representation
+    """
+
+    if date is None or isinstance(date, str):
+        return date
+
+    return date.isoformat()
+
+
+def __from_iso(date: str | None) -> datetime.datetime | None:
+    """
+    :param date: iso representation
+    :return: datetime as stored in the model dict
+    """
+
+    return None if date is None else datetime.datetime.fromisoformat(date)
@@ -1,14 +1,14 @@
 import logging
-import joblib
 import os
 import interfaces
 
 from dotenv import load_dotenv
 from typing import Any
 from root_file import ROOT_DIR
+from controller import model_cache, model_format, model_registry
 
 
-def save_model_by_name(model: interfaces.ModelInfoDict, name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> None:
+def save_model_by_name(model: interfaces.ModelInfoDict, name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str, overwrite: bool = False) -> str | None:
     """
     :param model: model to save
     :param name: name of model
@@ -17,25 +17,40 @@ def save_model_by_name(model: interfaces.ModelInfoDict, name: str, timeframe: st
     :param start_point: start of time series
     :param capability: weather capability to train
     :param column_name: column name of the weather capability
-    :return: None
+    :param overwrite: replace an existing model, used when updating models
+    :return: path of the saved model, None if saving failed
     """
 
-    path = __create_file_path(name, timeframe, resolution, start_point, capability, column_name)
+    path = __create_file_path(name, timeframe, resolution, start_point, capability, column_name, not overwrite)
 
     if path is None:
         raise TypeError("Path cannot be None")
 
     try:
-        # Pickle it
-        joblib.dump(model, path, compress=3)
+        # metadata header and model
+        header = model_format.write(path, model)
         logging.debug(f"Model saved to {path}")
     except Exception as e:
         logging.debug(f"Error during saving of {path}: {e}")
+        return None
+
+    model_cache.invalidate((name, timeframe, resolution, start_point, capability, column_name))
+
+    try:
+        model_registry.register(os.path.basename(path), path,
+                                __create_parameters(name, timeframe, resolution, start_point, capability, column_name),
+                                header)
+    except Exception as e:
+        # the model is saved, model_registry.sync adds the file when the service starts the next time
+        logging.warning(f"Registering {path} failed: {e}")
+
+    return path
 
 
 def load_model_by_name(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> interfaces.ModelInfoDict | None:
     """
-    method to load a model by name and parameters
+    method to load a model by name and parameters,
+    models are kept in an lru cache until their file changes
 
     :param name: name of model
     :param timeframe: duration of time series data trained
@@ -47,22 +62,83 @@ def load_model_by_name(name: str, timeframe: str, resolution: str, start_point:
     """
 
 
-    path = __create_file_path(name, timeframe, resolution, start_point, capability, column_name)
+    path = __create_file_path(name, timeframe, resolution, start_point, capability, column_name, False)
 
     if path is None:
         logging.debug(f"Created Path is None")
         raise TypeError(f"Created Path is None")
 
+    key = (name, timeframe, resolution, start_point, capability, column_name)
+
+    data = model_cache.get(key, path)
+    if data is not None:
+        logging.debug(f"{path} served from model cache")
+        return data
+
     try:
+        # stamp before loading, a file overwritten in between is detected on the next request
+        file_stamp = model_cache.stamp(path)
+
         # Load the model up, create predictions
-        data = joblib.load(path)
+        data = model_format.read(path)
+        model_registry.touch(os.path.basename(path))
+
+        if file_stamp is not None:
+            model_cache.put(key, path, data, file_stamp)
+
         return data
     except Exception as e:
         logging.debug(f"Loading {path} failed: {e}")
         return None
 
 
-def __create_file_path(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> str | None:
+def list_models(filters: dict[str, str] | None = None, limit: int | None = None) -> list[dict[str, Any]]:
+    """
+    saved models of the registry, the model files are not read
+
+    :param filters: parameters to match (name, timeframe, resolution, startPoint, capability, column)
+    :param limit: maximum amount of models
+    :return: list of model entries, newest first
+    """
+
+    return model_registry.list_models(filters, limit)
+
+
+def get_model_key(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> str:
+    """
+    key (file name) of a model
+
+    :param name: name of model
+    :param timeframe: duration of time series data trained
+    :param resolution: resolution of time series data trained
+    :param start_point: start of time series
+    :param capability: weather capability to train
+    :param column_name: column name of the weather capability
+    :return: file name of the model
+    """
+
+    return os.path.basename(__create_file_path(name, timeframe, resolution, start_point, capability, column_name, False))
+
+
+def get_model_stamp(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> tuple[int, int] | None:
+    """
+    identity of a saved model file, changes whenever the model is overwritten
+
+    :param name: name of model
+    :param timeframe: duration of time series data trained
+    :param resolution: resolution of time series data trained
+    :param start_point: start of time series
+    :param capability: weather capability to train
+    :param column_name: column name of the weather capability
+    :return: (mtime, size) of the model file or None if it does not exist
+    """
+
+    path = __create_file_path(name, timeframe, resolution, start_point, capability, column_name, False)
+
+    return model_cache.stamp(path)
+
+
+def __create_file_path(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str, check_duplicates: bool = True) -> str | None:
     """
     create a unique file name which is used to save and retrieve trained model data by name
 
@@ -72,6 +148,7 @@ def __create_file_path(name: str, timeframe: str, resolution: str, start_point:
     :param start_point: first day of timeseries
     :param capability: kind of weather data | plain if none
     :param column_name: name of weather data related column | none if no weather data
+    :param check_duplicates: False when loading, an existing file is expected then
     :return: unique file name
     """
 
@@ -86,17 +163,37 @@ def __create_file_path(name: str, timeframe: str, resolution: str, start_point:
     folder_path = f"{os.getenv("FILE_PATH_TRAINED_MODELS")}"
     full_path = os.path.join(ROOT_DIR, folder_path, file_name)
 
-    if not __has_duplicates(full_path):
+    if not check_duplicates or not __has_duplicates(full_path):
         return full_path
 
     return None
 
 
+def __create_parameters(name: str, timeframe: str, resolution: str, start_point: str, capability: str, column_name: str) -> dict[str, str]:
+    """
+    parameters of a model as stored in the registry
+
+    :param name: smartmeter name
+    :param timeframe: duration of timesries
+    :param resolution: resolution of timesries
+    :param start_point: first day of timeseries
+    :param capability: kind of weather data | plain if none
+    :param column_name: name of weather data related column
+    :return: dict of parameters
+    """
+
+    if capability == "plain":
+        column_name = "no_column"
+
+    return {"name": name, "timeframe": timeframe, "resolution": resolution, "startPoint": start_point,
+            "capability": capability, "column": column_name}
+
+
 def __has_duplicates(full_path: str) -> bool:
     """
-    create a temp name and check if model already exists
+    check in the model registry if the model already exists
     
-    :param file_name: name of file to test
+    :param full_path: path of file to test
     :return: True if duplicate, False else
     """
 
@@ -105,7 +202,7 @@ def __has_duplicates(full_path: str) -> bool:
 
     # only perform duplicate check if env variable is False
     if not allow:
-        if os.path.exists(full_path):
+        if model_registry.exists(os.path.basename(full_path)):
             logging.debug(f"{full_path} already exists. Cancel saving")
             return True
         else:
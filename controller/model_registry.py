@@ -0,0 +1,252 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from dotenv import load_dotenv
+from root_file import ROOT_DIR
+
+from controller import model_format
+
+# parameters of a model which can be used to filter the listing
+FILTERS = ["name", "timeframe", "resolution", "startPoint", "capability", "column"]
+
+__COLUMNS = {"name": "name", "timeframe": "timeframe", "resolution": "resolution", "startPoint": "start_point",
+             "capability": "capability", "column": "column_name"}
+
+
+def register(key: str, path: str, parameters: dict[str, str], header: dict[str, Any]) -> None:
+    """
+    add or replace the entry of a saved model
+
+    :param key: file name of the model
+    :param path: path of the model file
+    :param parameters: name, timeframe, resolution, startPoint, capability and column of the model
+    :param header: metadata header written by model_format
+    """
+
+    with __connect() as connection:
+        __insert(connection, key, path, parameters, header, os.path.getsize(path))
+
+    logging.debug(f"Model {key} registered")
+
+
+def exists(key: str) -> bool:
+    """
+    :param key: file name of the model
+    :return: True if a model of the key is registered
+    """
+
+    with __connect() as connection:
+        row = connection.execute("SELECT 1 FROM models WHERE key=?", (key,)).fetchone()
+
+    return row is not None
+
+
+def touch(key: str) -> None:
+    """
+    set the last used time of a model to now
+
+    :param key: file name of the model
+    """
+
+    try:
+        with __connect() as connection:
+            connection.execute("UPDATE models SET last_used=? WHERE key=?", (__now(), key))
+    except sqlite3.Error as e:
+        logging.debug(f"Updating last use of {key} failed: {e}")
+
+
+def list_models(filters: dict[str, str] | None = None, limit: int | None = None) -> list[dict[str, Any]]:
+    """
+    registered models matching all given filters, newest first
+
+    :param filters: values of FILTERS to match
+    :param limit: maximum amount of models
+    :return: list of model entries
+    """
+
+    conditions, params = [], []
+    for name, value in (filters or {}).items():
+        if name not in __COLUMNS:
+            raise ValueError(f"Unsupported filter {name}")
+        conditions.append(f"{__COLUMNS[name]}=?")
+        params.append(value)
+
+    query_string = "SELECT * FROM models"
+    if conditions:
+        query_string += " WHERE " + " AND ".join(conditions)
+    query_string += " ORDER BY created DESC"
+    if limit is not None:
+        query_string += " LIMIT ?"
+        params.append(limit)
+
+    with __connect() as connection:
+        connection.row_factory = sqlite3.Row
+        rows = connection.execute(query_string, params).fetchall()
+
+    return [__to_entry(row) for row in rows]
+
+
+def sync() -> int:
+    """
+    register model files which are missing in the registry, e.g. saved before the registry existed,
+    and remove entries whose file was deleted. Walks the model folder, not used for lookups
+
+    :return: amount of registered files
+    """
+
+    with __connect() as connection:
+        return __sync(connection)
+
+
+def __sync(connection: sqlite3.Connection) -> int:
+    """
+    :param connection: open registry connection
+    :return: amount of registered files
+    """
+
+    registered = {row[0]: row[1] for row in connection.execute("SELECT key, path FROM models")}
+    added = 0
+
+    for path in glob.glob(os.path.join(__model_folder(), "*.pkl")):
+        key = os.path.basename(path)
+        if key in registered:
+            registered.pop(key)
+            continue
+
+        try:
+            header = model_format.read_metadata(path) or {}
+        except (OSError, ValueError) as e:
+            logging.debug(f"Reading header of {path} failed: {e}")
+            continue
+
+        __insert(connection, key, path, __parse_key(key), header, os.path.getsize(path))
+        added += 1
+
+    # remaining entries have no file anymore
+    connection.executemany("DELETE FROM models WHERE key=?", [(key,) for key in registered])
+
+    if added or registered:
+        logging.debug(f"Model registry synced, {added} added, {len(registered)} removed")
+
+    return added
+
+
+def __insert(connection: sqlite3.Connection, key: str, path: str, parameters: dict[str, str],
+             header: dict[str, Any], size: int) -> None:
+    """
+    :param connection: open registry connection
+    :param key: file name of the model
+    :param path: path of the model file
+    :param parameters: parameters of the model, values may be None if unknown
+    :param header: metadata header, empty for files saved before the header format
+    :param size: file size in bytes
+    """
+
+    connection.execute(
+        "INSERT OR REPLACE INTO models (key, path, name, timeframe, resolution, start_point, capability, column_name, "
+        "size, created, start_date, end_date, training_time, orders, aic, nobs, codec, last_used) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+        "(SELECT last_used FROM models WHERE key=?))",
+        (key, path, *[parameters.get(name) for name in FILTERS], size, header.get("created") or __now(),
+         header.get("startDate"), header.get("endDate"), header.get("trainingTime"),
+         json.dumps([header["order"], header["seasonalOrder"]]) if "order" in header else None,
+         header.get("aic"), header.get("nobs"), header.get("codec"), key))
+
+
+def __parse_key(key: str) -> dict[str, str]:
+    """
+    parameters of a file saved before the registry existed, names may contain "-",
+    so only the resolution is certain
+
+    :param key: file name of the model
+    :return: parameters which could be read from the key
+    """
+
+    resolution = key.split("-")[0]
+
+    return {"resolution": resolution} if resolution in ("hourly", "daily", "weekly") else {}
+
+
+def __to_entry(row: sqlite3.Row) -> dict[str, Any]:
+    """
+    :param row: row of the models table
+    :return: entry as answered by the listing
+    """
+
+    orders = json.loads(row["orders"]) if row["orders"] else [None, None]
+
+    return {
+        "key": row["key"],
+        "name": row["name"],
+        "timeframe": row["timeframe"],
+        "resolution": row["resolution"],
+        "startPoint": row["start_point"],
+        "capability": row["capability"],
+        "column": row["column_name"],
+        "size": row["size"],
+        "created": row["created"],
+        "startDate": row["start_date"],
+        "endDate": row["end_date"],
+        "trainingTime": row["training_time"],
+        "order": orders[0],
+        "seasonalOrder": orders[1],
+        "aic": row["aic"],
+        "nobs": row["nobs"],
+        "codec": row["codec"],
+        "lastUsed": row["last_used"],
+    }
+
+
+def __now() -> str:
+    """
+    :return: current utc time in iso format
+    """
+
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def __model_folder() -> str:
+    """
+    :return: absolute path of FILE_PATH_TRAINED_MODELS
+    """
+
+    load_dotenv()
+
+    return os.path.join(ROOT_DIR, f"{os.getenv("FILE_PATH_TRAINED_MODELS")}")
+
+
+@contextmanager
+def __connect() -> Iterator[sqlite3.Connection]:
+    """
+    open the registry (FILE_PATH_MODEL_REGISTRY), shared by all training processes.
+    A new registry is filled with the model files which already exist
+
+    :return: sqlite connection, committed and closed afterwards
+    """
+
+    load_dotenv()
+    path = os.path.join(ROOT_DIR, os.getenv("FILE_PATH_MODEL_REGISTRY") or
+                        os.path.join(f"{os.getenv("FILE_PATH_TRAINED_MODELS")}", "model_registry.sqlite"))
+
+    created = not os.path.exists(path)
+    connection = sqlite3.connect(path, timeout=30)
+
+    try:
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS models (key TEXT PRIMARY KEY, path TEXT NOT NULL, name TEXT, "
+                               "timeframe TEXT, resolution TEXT, start_point TEXT, capability TEXT, column_name TEXT, "
+                               "size INTEGER NOT NULL, created TEXT NOT NULL, start_date TEXT, end_date TEXT, "
+                               "training_time REAL, orders TEXT, aic REAL, nobs INTEGER, codec TEXT, last_used TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS models_name_idx ON models (name, resolution)")
+            connection.execute("CREATE INDEX IF NOT EXISTS models_created_idx ON models (created)")
+            if created:
+                __sync(connection)
+            yield connection
+    finally:
+        connection.close()
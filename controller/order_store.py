@@ -0,0 +1,108 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+from dotenv import load_dotenv
+from root_file import ROOT_DIR
+
+
+def get_orders(name: str, resolution: str, capability: str, column_name: str) -> tuple[tuple[int, int, int], tuple[int, int, int, int], bool] | None:
+    """
+    orders and constant selected by the last training of a smartmeter configuration
+
+    :param name: smartmeter name
+    :param resolution: resolution of time series data trained
+    :param capability: weather capability, plain if none
+    :param column_name: column name of the weather capability
+    :return: (order, seasonal_order, with_intercept) or None if never trained
+    """
+
+    try:
+        with __connect() as connection:
+            row = connection.execute("SELECT orders FROM model_orders WHERE key=?",
+                                     (__create_key(name, resolution, capability, column_name),)).fetchone()
+    except sqlite3.Error as e:
+        logging.debug(f"Reading orders of {name} failed: {e}")
+        return None
+
+    if row is None:
+        return None
+
+    order, seasonal_order, *intercept = json.loads(row[0])
+
+    # saved without the constant, stepwise auto_arima starts without it from d + D >= 2 on
+    with_intercept = intercept[0] if intercept else order[1] + seasonal_order[1] < 2
+
+    return tuple(order), tuple(seasonal_order), with_intercept
+
+
+def save_orders(name: str, resolution: str, capability: str, column_name: str,
+                order: tuple[int, int, int], seasonal_order: tuple[int, int, int, int], with_intercept: bool) -> None:
+    """
+    persist the orders of a trained model for the next training of the same configuration,
+    the constant is kept as well, the search may have dropped it
+
+    :param name: smartmeter name
+    :param resolution: resolution of time series data trained
+    :param capability: weather capability, plain if none
+    :param column_name: column name of the weather capability
+    :param order: (p, d, q) of the model
+    :param seasonal_order: (P, D, Q, m) of the model
+    :param with_intercept: whether the model has a constant
+    """
+
+    orders = json.dumps([list(order), list(seasonal_order), bool(with_intercept)])
+
+    try:
+        with __connect() as connection:
+            connection.execute("INSERT INTO model_orders (key, orders, updated) VALUES (?, ?, ?) "
+                               "ON CONFLICT (key) DO UPDATE SET orders = excluded.orders, updated = excluded.updated",
+                               (__create_key(name, resolution, capability, column_name), orders,
+                                datetime.datetime.now(datetime.timezone.utc).isoformat()))
+        logging.debug(f"Orders {orders} of {name} saved")
+    except sqlite3.Error as e:
+        logging.debug(f"Saving orders of {name} failed: {e}")
+
+
+def __create_key(name: str, resolution: str, capability: str, column_name: str) -> str:
+    """
+    orders are shared by every timeframe and start point of a configuration
+
+    :param name: smartmeter name
+    :param resolution: resolution of time series data trained
+    :param capability: weather capability, plain if none
+    :param column_name: column name of the weather capability
+    :return: key of the configuration
+    """
+
+    if capability == "plain":
+        column_name = "no_column"
+
+    return f"{resolution}-{name}-{capability}-{column_name}"
+
+
+@contextmanager
+def __connect() -> Iterator[sqlite3.Connection]:
+    """
+    open the order database (FILE_PATH_MODEL_ORDERS), shared by all training processes
+
+    :return: sqlite connection, committed and closed afterwards
+    """
+
+    load_dotenv()
+    path = os.path.join(ROOT_DIR, os.getenv("FILE_PATH_MODEL_ORDERS") or
+                        os.path.join(f"{os.getenv("FILE_PATH_TRAINED_MODELS")}", "model_orders.sqlite"))
+
+    connection = sqlite3.connect(path, timeout=30)
+
+    try:
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS model_orders (key TEXT PRIMARY KEY, orders TEXT NOT NULL, "
+                               "updated TEXT NOT NULL)")
+            yield connection
+    finally:
+        connection.close()
@@ -1,17 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 
+import numpy as np
 import pandas as pd
 import datetime
+import logging
 import os
+import uuid
 
 from dotenv import load_dotenv
 
 from interfaces import SelectDateValueData
-from weather import dwd_weather
+from weather import alignment, dwd_client, exogenous, weather_catalog
 from dateutil.relativedelta import relativedelta
-from database import data_selector as ds
-from forecasting import model_training, data_forecast, model_metrics
-from controller import model_handling
+from database import data_selector as ds, db_connector
+from forecasting import backtesting, feature_screening, model_training, data_forecast, model_metrics
+from controller import (backtest_store, model_handling, model_registry, model_cache, forecast_cache, order_store,
+                        training_jobs)
 import interfaces
 
 
@@ -39,7 +44,7 @@ def get_weather_capabilities(columns: bool) -> dict[str, list[str]]:
     :param columns: if true -> also columns, false else
     :return: dict of weather capabilities
     """
-    return dwd_weather.get_weather_capabilities(columns)
+    return weather_catalog.get_capabilities(columns)
 
 
 def get_columns_of_capability(capability: str) -> dict[str, list[str]]:
@@ -50,7 +55,7 @@ def get_columns_of_capability(capability: str) -> dict[str, list[str]]:
     :return: result_dict of columns
     """
 
-    query_dict = dwd_weather.get_columns_of_capability(capability)
+    query_dict = weather_catalog.get_columns_of_capability(capability)
 
     result_dict = {}
 
@@ -60,6 +65,44 @@ def get_columns_of_capability(capability: str) -> dict[str, list[str]]:
     return result_dict
 
 
+def get_models(filters: dict[str, str], limit: int | None = None) -> list[dict]:
+    """
+    metadata of the saved models from the model registry
+
+    :param filters: parameters to match (name, timeframe, resolution, startPoint, capability, column)
+    :param limit: maximum amount of models
+    :return: list of model metadata, newest first
+    """
+
+    return model_handling.list_models(filters, limit)
+
+
+def start_background_tasks() -> None:
+    """
+    start the background work of the service, called once when the service starts
+
+    :return: None
+    """
+
+    weather_catalog.start_background_refresh()
+    model_registry.sync()
+
+
+def get_service_stats() -> dict[str, dict]:
+    """
+    collect counters of the caches used by the service
+
+    :return: dict of stats per component
+    """
+
+    return {
+        "modelCache": model_cache.get_stats(),
+        "forecastCache": forecast_cache.get_stats(),
+        "dbPool": db_connector.get_pool_stats(),
+        "dwdCircuitBreaker": dwd_client.get_breaker_state(),
+    }
+
+
 def get_smartmeter_data(meter_name: str, timeframe: str, resolution: str, start_date: str) -> interfaces.SmartmeterData | None:
     """
     create a dict from parameters containing real values and date times
@@ -74,8 +117,12 @@ def get_smartmeter_data(meter_name: str, timeframe: str, resolution: str, start_
     start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S")
 
     end_date = create_end_date(timeframe, start_date)
-    data = ds.select_date_value(meter_name, start_date, end_date)
-    data = dict(__resample_data(data, resolution))
+
+    # aggregated inside the db, resample with pandas if timescale is not available
+    data = ds.select_date_value(meter_name, start_date, end_date, resolution)
+    if not ds.has_timescale():
+        data = __resample_data(data, resolution)
+    data = dict(data)
 
     load_dotenv()
     format = os.getenv("DATETIME_STANDARD_FORMAT")
@@ -125,7 +172,7 @@ def create_end_date(timeframe: str, start_point: datetime.datetime) -> datetime.
 
 
 def train_model(meter_name: str, timeframe: str, resolution: str, start_date_string: str, weather_capability: str,
-                column_name: str):
+                column_name: str, full_search: bool = False) -> str:
     """
     train auto arima model based on parameters
     
@@ -135,23 +182,109 @@ def train_model(meter_name: str, timeframe: str, resolution: str, start_date_str
     :param start_date_string: first date of requested data
     :param weather_capability: capability of dwd weather
     :param column_name: column name of dwd data
-    :return: None
+    :param full_search: ignore the orders of previous trainings
+    :return: key (file name) of the saved model
     """
 
-    start_date = datetime.datetime.strptime(start_date_string, "%Y-%m-%d %H:%M:%S").replace(
-        tzinfo=datetime.timezone.utc)
-    end_date = create_end_date(timeframe, start_date).replace(tzinfo=datetime.timezone.utc)
-    start = int(start_date.timestamp())
-    end = int(end_date.timestamp())
+    start_date, end_date = __create_training_window(timeframe, start_date_string)
 
-    data = ds.select_date_value(meter_name, start_date, end_date)
-    df = pd.DataFrame.from_dict(cast(dict, data))
+    df = __align_values(ds.select_date_value_arrays(meter_name, start_date, end_date))
 
-    if weather_capability == "plain":
-        model, train_time = model_training.train_model(df[["value"]], None)
-    else:
-        weather_df = dwd_weather.get_weather_data(weather_capability, column_name, start, end)
-        model, train_time = model_training.train_model(df[["value"]], weather_df[[column_name]])
+    weather = __get_training_weather(weather_capability, column_name, *__get_date_range(df))
+    alignment.check_length(weather, len(df), "Weather data")
+
+    return fit_and_save_model(df, weather, meter_name, timeframe, resolution, start_date_string,
+                              weather_capability, column_name, full_search)
+
+
+def train_models(meter_names: list[str] | str, timeframe: str, resolution: str, start_date_string: str,
+                 weather_capability: str, column_name: str, full_search: bool = False) -> interfaces.TrainingBatchData:
+    """
+    queue the training of multiple smartmeters sharing the same parameters,
+    data of all smartmeters is selected at once and weather data is requested only once
+
+    :param meter_names: names of smartmeters to train or "all"
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date_string: first date of requested data
+    :param weather_capability: capability of dwd weather
+    :param column_name: column name of dwd data
+    :param full_search: ignore the orders of previous trainings
+    :return: batch id, job id per smartmeter and smartmeters which could not be queued
+    """
+
+    if meter_names == "all":
+        meter_names = list(get_meter_names())
+
+    start_date, end_date = __create_training_window(timeframe, start_date_string)
+
+    data = ds.select_date_value_arrays_of_meters(meter_names, start_date, end_date)
+    # requested once for the window, every smartmeter gets the rows of its observed hours
+    weather = __get_training_weather(weather_capability, column_name, start_date, end_date)
+    window = alignment.hourly_index(start_date, end_date)
+    alignment.check_length(weather, len(window), "Weather data")
+
+    batch: interfaces.TrainingBatchData = {"batchId": uuid.uuid4().hex, "jobs": {}, "failed": {}}
+
+    for meter_name in meter_names:
+        if meter_name not in data:
+            batch["failed"][meter_name] = "No data in timeframe"
+            continue
+
+        try:
+            df = __align_values(data[meter_name])
+        except ValueError as e:
+            batch["failed"][meter_name] = str(e)
+            continue
+
+        first = int((alignment.to_hours(df["date"].iloc[:1])[0] - window[0]).astype(np.int64))
+        meter_weather = None if weather is None else weather[first:first + len(df)]
+
+        try:
+            batch["jobs"][meter_name] = training_jobs.submit_job("train", meter_name, fit_and_save_model,
+                                                                 df, meter_weather, meter_name, timeframe, resolution,
+                                                                 start_date_string, weather_capability, column_name,
+                                                                 full_search, batch=batch["batchId"])
+        except training_jobs.QueueFullError as e:
+            batch["failed"][meter_name] = str(e)
+
+    return batch
+
+
+def fit_and_save_model(df: pd.DataFrame, weather: np.ndarray | None, meter_name: str, timeframe: str,
+                       resolution: str, start_date_string: str, weather_capability: str, column_name: str,
+                       full_search: bool = False) -> str:
+    """
+    train auto arima model on already selected data and save it,
+    module level to be executed by the training worker processes.
+    Orders of the previous training of the configuration are reused depending on MODEL_WARM_START
+    (fixed: fit them directly, seeded: start the search at them, off: always search)
+
+    :param df: hourly smartmeter dates and values, the model covers its first to last date
+    :param weather: exogenous weather matrix matching df row by row, None if plain
+    :param meter_name: name of smartmeter to train
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date_string: first date of requested data
+    :param weather_capability: capability of dwd weather
+    :param column_name: column name of dwd data
+    :param full_search: ignore the orders of previous trainings
+    :return: key (file name) of the saved model
+    """
+
+    start_date, end_date = __get_date_range(df)
+
+    load_dotenv()
+    warm_start = os.getenv("MODEL_WARM_START") or "fixed"
+
+    orders = None
+    if not full_search and warm_start != "off":
+        orders = order_store.get_orders(meter_name, resolution, weather_capability, column_name)
+
+    model, train_time = model_training.train_model(df, weather, orders, warm_start)
+
+    order_store.save_orders(meter_name, resolution, weather_capability, column_name, model.order,
+                            model.seasonal_order, model.with_intercept)
 
     model_dict: interfaces.ModelInfoDict = {
         "model": model,
@@ -160,14 +293,290 @@ def train_model(meter_name: str, timeframe: str, resolution: str, start_date_str
         "end_date": end_date,
     }
 
-    model_handling.save_model_by_name(model_dict, meter_name, timeframe, resolution, start_date_string,
-                                      weather_capability, column_name)
+    path = model_handling.save_model_by_name(model_dict, meter_name, timeframe, resolution, start_date_string,
+                                             weather_capability, column_name)
+
+    if path is None:
+        raise IOError(f"Model of {meter_name} could not be saved")
+
+    return os.path.basename(path)
+
+
+def update_model(meter_name: str, timeframe: str, resolution: str, start_date_string: str, weather_capability: str,
+                 column_name: str, until_string: str | None = None) -> str:
+    """
+    append the observations after the end date of a saved model without searching its order again
+
+    :param meter_name: name of smartmeter
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date_string: first date of the trained data
+    :param weather_capability: capability of dwd weather
+    :param column_name: column name of dwd data
+    :param until_string: last date of new observations, now if None
+    :return: key (file name) of the updated model
+    """
+
+    model_dict = model_handling.load_model_by_name(meter_name, timeframe, resolution, start_date_string,
+                                                   weather_capability, column_name)
+
+    if model_dict is None:
+        raise FileNotFoundError(f"No model of {meter_name} to update")
+
+    start_date = model_dict["end_date"] + datetime.timedelta(hours=1)
+    if until_string is None:
+        end_date = datetime.datetime.now(datetime.timezone.utc)
+    else:
+        end_date = datetime.datetime.strptime(until_string, "%Y-%m-%d %H:%M:%S").replace(
+            tzinfo=datetime.timezone.utc)
+
+    data = ds.select_date_value_arrays(meter_name, start_date, end_date)
+
+    if not len(data["value"]):
+        logging.debug(f"No new observations of {meter_name} after {model_dict['end_date']}")
+        return model_handling.get_model_key(meter_name, timeframe, resolution, start_date_string,
+                                            weather_capability, column_name)
+
+    # the new observations have to continue right after the model, so only the head is filled
+    df = __align_values(data, start_date)
+    last_date = df["date"].iloc[-1].to_pydatetime()
+
+    weather = __get_training_weather(weather_capability, column_name, start_date, last_date)
+    alignment.check_length(weather, len(df), "Weather data")
+
+    model, _ = model_training.update_model(model_dict["model"], df, weather)
+
+    model_dict["model"] = model
+    model_dict["end_date"] = last_date
+
+    path = model_handling.save_model_by_name(model_dict, meter_name, timeframe, resolution, start_date_string,
+                                             weather_capability, column_name, overwrite=True)
+
+    if path is None:
+        raise IOError(f"Model of {meter_name} could not be saved")
+
+    return os.path.basename(path)
+
+
+def run_backtest(meter_name: str, timeframe: str, resolution: str, start_date_string: str, weather_capability: str,
+                 column_name: str, n_cutoffs: int = 10, horizon: int = 24, step: int | None = None) -> str:
+    """
+    evaluate the configuration at n_cutoffs forecast origins at the end of the training window,
+    module level to be executed by the training worker processes.
+    The orders of the last training are fitted once per block of origins and updated with the observations
+    between the origins, blocks are evaluated by BACKTEST_WORKERS processes
+    (nested in the training worker, see training_jobs.get_nested_workers)
+
+    :param meter_name: name of smartmeter
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date_string: first date of requested data
+    :param weather_capability: capability of dwd weather
+    :param column_name: column name of dwd data
+    :param n_cutoffs: amount of forecast origins
+    :param horizon: periods forecasted at every origin
+    :param step: periods between two origins, horizon if None
+    :return: id of the stored backtest
+    """
+
+    start_date, end_date = __create_training_window(timeframe, start_date_string)
+
+    df = __align_values(ds.select_date_value_arrays(meter_name, start_date, end_date))
+    values = df["value"].to_numpy()
+    weather = __get_training_weather(weather_capability, column_name, *__get_date_range(df))
+    alignment.check_length(weather, len(values), "Weather data")
+
+    cutoffs = backtesting.create_cutoffs(len(values), n_cutoffs, horizon, step or horizon)
+
+    orders = order_store.get_orders(meter_name, resolution, weather_capability, column_name)
+    if orders is None:
+        # search once, every block fits the found orders
+        model, _ = model_training.train_model(pd.DataFrame({"value": values[:cutoffs[0]]}),
+                                              None if weather is None else weather[:cutoffs[0]])
+        orders = (model.order, model.seasonal_order, model.with_intercept)
+
+    load_dotenv()
+    workers = training_jobs.get_nested_workers("BACKTEST_WORKERS")
+
+    start_time = datetime.datetime.now(datetime.timezone.utc)
+    forecasts = backtesting.run_backtest(values, weather, orders, cutoffs, horizon, workers)
+    actuals = backtesting.collect_actuals(values, cutoffs, horizon)
+
+    metrics = model_metrics.calculate_horizon_metrics(actuals, forecasts)
+    # every forecasted value as one step
+    overall = model_metrics.calculate_horizon_metrics(actuals.reshape(-1, 1), forecasts.reshape(-1, 1))
+
+    config = {"timeframe": timeframe, "resolution": resolution, "startPoint": start_date_string,
+              "weatherCapability": weather_capability, "weatherColumn": column_name,
+              "nCutoffs": n_cutoffs, "horizon": horizon, "step": step or horizon}
+
+    format = os.getenv("DATETIME_STANDARD_FORMAT")
+
+    result = {
+        "order": list(orders[0]),
+        "seasonalOrder": list(orders[1]),
+        "withIntercept": orders[2],
+        "duration": (datetime.datetime.now(datetime.timezone.utc) - start_time).total_seconds(),
+        "cutoffs": pd.DatetimeIndex(df["date"].iloc[cutoffs]).strftime(format).tolist(),
+        "horizonMetrics": metrics,
+        "overallMetrics": {name: values_per_step[0] for name, values_per_step in overall.items()},
+        "forecasts": forecasts.tolist(),
+        "actuals": actuals.tolist(),
+    }
+
+    return backtest_store.save_backtest(meter_name, config, result)
+
+
+def run_weather_screening(meter_name: str, timeframe: str, resolution: str, start_date_string: str,
+                          holdout: int = 24, capabilities: list[str] | None = None) -> dict:
+    """
+    rank every weather column of the catalog by how much it improves a forecast of the smartmeter,
+    module level to be executed by the training worker processes.
+    The orders of the plain configuration (searched once if never trained) are fitted with every column
+    in WEATHER_SCREENING_WORKERS processes (nested in the training worker, see training_jobs.get_nested_workers),
+    only the best columns need a full training
+
+    :param meter_name: name of smartmeter
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date_string: first date of requested data
+    :param holdout: periods at the end of the timeframe which are forecasted to measure the error
+    :param capabilities: capabilities to screen, all of the catalog if None
+    :return: baseline without weather, ranked columns with fit time and error gain, skipped columns
+    """
+
+    start_date, end_date = __create_training_window(timeframe, start_date_string)
+
+    df = __align_values(ds.select_date_value_arrays(meter_name, start_date, end_date))
+    values = df["value"].to_numpy()
+    start_date, end_date = __get_date_range(df)
+    if len(values) <= 2 * holdout:
+        raise ValueError(f"{len(values)} observations are too few for a holdout of {holdout}")
+
+    catalog = weather_catalog.get_capabilities(True)
+    candidates, skipped = {}, {}
+
+    for capability in capabilities or list(catalog):
+        for column_name in catalog.get(capability, []):
+            if column_name == "ts":
+                continue
+
+            key = f"{capability}/{column_name}"
+            try:
+                column = __get_training_weather(capability, column_name, start_date, end_date)[:, 0]
+                alignment.check_length(column, len(values), "Weather data")
+            except (ValueError, TypeError) as e:
+                skipped[key] = str(e)
+                continue
+
+            if np.ptp(column) == 0:
+                skipped[key] = "Constant values"
+            else:
+                candidates[key] = column
+
+    orders = order_store.get_orders(meter_name, resolution, "plain", "")
+    if orders is None:
+        model, _ = model_training.train_model(pd.DataFrame({"value": values[:-holdout]}), None)
+        orders = (model.order, model.seasonal_order, model.with_intercept)
+
+    workers = training_jobs.get_nested_workers("WEATHER_SCREENING_WORKERS")
+
+    result = feature_screening.screen_columns(values, candidates, orders, holdout, workers)
+    result["failed"].update(skipped)
+    result["order"] = list(orders[0])
+    result["seasonalOrder"] = list(orders[1])
+    result["withIntercept"] = orders[2]
+
+    return result
+
+
+def get_backtest(backtest_id: str) -> dict | None:
+    """
+    :param backtest_id: id of the stored backtest
+    :return: config and results of the backtest or None if unknown
+    """
+
+    return backtest_store.get_backtest(backtest_id)
+
+
+def get_backtests(meter_name: str | None = None) -> list[dict]:
+    """
+    :param meter_name: only backtests of this smartmeter, all if None
+    :return: stored backtests without results, newest first
+    """
+
+    return backtest_store.get_backtests(meter_name)
+
+
+def __create_training_window(timeframe: str, start_date_string: str) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    utc start and end date of the training data
+
+    :param timeframe: amount of weeks
+    :param start_date_string: first date of requested data
+    :return: start and end date
+    """
+
+    start_date = datetime.datetime.strptime(start_date_string, "%Y-%m-%d %H:%M:%S").replace(
+        tzinfo=datetime.timezone.utc)
+    end_date = create_end_date(timeframe, start_date).replace(tzinfo=datetime.timezone.utc)
+
+    return start_date, end_date
+
+
+def __align_values(data: interfaces.DateValueArrays, start_date: datetime.datetime | None = None) -> pd.DataFrame:
+    """
+    smartmeter values reindexed onto every utc hour up to the last observed hour, the same hours the weather matrix
+    is requested for. The index starts at the first observed hour, a head or tail which was never observed is not
+    filled in; missing hours in between are filled with the GAP_FILL policy
+
+    :param data: selected dates and values
+    :param start_date: first hour of the index instead of the first observed hour, the head is filled as well
+    :return: df of date (utc hours) and float64 value
+    :raises ValueError: if there is no data or too many hours are missing
+    """
+
+    if not len(data["value"]):
+        raise ValueError("No data in timeframe")
+
+    first, last = alignment.observed_range(data["date"])
+    first = first if start_date is None else start_date
+
+    values = alignment.align(data["date"], data["value"], first, last)[:, 0]
+    dates = pd.DatetimeIndex(alignment.hourly_index(first, last)).tz_localize("UTC")
+
+    return pd.DataFrame({"date": dates, "value": values})
+
+
+def __get_date_range(df: pd.DataFrame) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    :param df: aligned smartmeter data of __align_values
+    :return: first and last hour
+    """
+
+    return df["date"].iloc[0].to_pydatetime(), df["date"].iloc[-1].to_pydatetime()
+
+
+def __get_training_weather(weather_capability: str, column_name: str, start_date: datetime.datetime,
+                           end_date: datetime.datetime) -> np.ndarray | None:
+    """
+    request the exogenous weather columns of the training window
+
+    :param weather_capability: capability of dwd weather, plain if none, multiple joined by exogenous.SEPARATOR
+    :param column_name: column name of dwd data, multiple joined by exogenous.SEPARATOR
+    :param start_date: first date of training data
+    :param end_date: last date of training data
+    :return: float64 matrix of the weather columns or None if plain
+    """
+
+    return exogenous.build_matrix(weather_capability, column_name, start_date, end_date)
 
 
 def forecast(meter_name: str, timeframe: str, resolution: str, start_date: str, weather_capability: str,
-             column_name: str) -> interfaces.ForecastData | None:
+             column_name: str, n_periods: int = 24) -> interfaces.ForecastData | None:
     """
-    predict data based on parameters
+    predict data based on parameters,
+    identical requests are answered from the forecast cache until the model changes
     
     :param meter_name: name of smartmeter
     :param timeframe: amount of weeks
@@ -175,25 +584,31 @@ def forecast(meter_name: str, timeframe: str, resolution: str, start_date: str,
     :param start_date: first date
     :param weather_capability:
     :param column_name:
+    :param n_periods: periods to forecast
     :return: json representation of metrics and parameters
     """
 
+    __check_n_periods(n_periods)
+
+    cache_key = (meter_name, timeframe, resolution, start_date, weather_capability, column_name, n_periods)
+    model_stamp = model_handling.get_model_stamp(meter_name, timeframe, resolution, start_date, weather_capability,
+                                                 column_name)
+
+    data = forecast_cache.get(cache_key, model_stamp)
+    if data is not None:
+        return data
+
     # load model by parameters
     model_dict = model_handling.load_model_by_name(meter_name, timeframe, resolution, start_date, weather_capability,
                                                    column_name)
 
-    # create 24 forecast label dates
-    forecast_labels = data_forecast.create_forecast_labels(model_dict["end_date"], 24, resolution)
+    # create forecast label dates
+    forecast_labels = data_forecast.create_forecast_labels(model_dict["end_date"], n_periods, resolution)
 
     # use model and weather info to get predicted data
-    if weather_capability == "plain":
-        forecast_df = data_forecast.create_forecast_data(model_dict["model"], 24, None)
-    else:
-        # use labels to get weather info
-        weather_df = dwd_weather.get_weather_data(weather_capability, column_name, int(forecast_labels[0].timestamp()),
-                                                  int(forecast_labels[-1].timestamp()))
-
-        forecast_df = data_forecast.create_forecast_data(model_dict["model"], 24, weather_df[[column_name]])
+    weather = __get_forecast_weather(weather_capability, column_name, forecast_labels)
+    alignment.check_length(weather, n_periods, "Weather data")
+    forecast_df = data_forecast.create_forecast_data(model_dict["model"], n_periods, weather)
 
     # select real values to compare with predicted data
     real_values = ds.select_date_value(meter_name, forecast_labels[0], forecast_labels[-1])["value"]
@@ -204,7 +619,7 @@ def forecast(meter_name: str, timeframe: str, resolution: str, start_date: str,
     # change labels to string repr
     load_dotenv()
     format = os.getenv("DATETIME_STANDARD_FORMAT")
-    forecast_labels = [dt_index.strftime(format) for dt_index in forecast_labels]
+    forecast_labels = forecast_labels.strftime(format).tolist()
 
     # build dict data object
     data = forecast_df.to_dict(orient="list")
@@ -222,9 +637,120 @@ def forecast(meter_name: str, timeframe: str, resolution: str, start_date: str,
 
     data = cast(interfaces.ForecastData, data)
 
+    forecast_cache.put(cache_key, model_stamp, data)
+
     return data
 
 
+def forecast_meters(meter_names: list[str] | str, timeframe: str, resolution: str, start_date: str,
+                    weather_capability: str, column_name: str, n_periods: int = 24) -> interfaces.BulkForecastData:
+    """
+    forecast many smartmeters sharing one configuration at once,
+    models are loaded and predicted concurrently (FORECAST_WORKERS threads) and weather data is requested
+    once per forecast range. The forecasts are returned as one columnar table with a row per smartmeter and period
+
+    :param meter_names: names of smartmeters or "all"
+    :param timeframe: amount of weeks
+    :param resolution: data resolution
+    :param start_date: first date
+    :param weather_capability: capability of dwd weather
+    :param column_name: column name of dwd data
+    :param n_periods: periods to forecast per smartmeter
+    :return: columns name, date, value, lower_conf_values, upper_conf_values and smartmeters which failed
+    """
+
+    __check_n_periods(n_periods)
+
+    if meter_names == "all":
+        meter_names = list(get_meter_names())
+
+    load_dotenv()
+    workers = int(os.getenv("FORECAST_WORKERS") or min(8, os.cpu_count() or 1))
+    failed: dict[str, str] = {}
+
+    def load(meter_name: str) -> interfaces.ModelInfoDict | None:
+        return model_handling.load_model_by_name(meter_name, timeframe, resolution, start_date, weather_capability,
+                                                 column_name)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        models = dict(zip(meter_names, executor.map(load, meter_names)))
+
+        # models of one configuration usually share the end date, so the weather is requested once
+        labels, weather = {}, {}
+        for meter_name, model_dict in models.items():
+            if model_dict is None:
+                failed[meter_name] = "No model"
+                continue
+
+            forecast_labels = data_forecast.create_forecast_labels(model_dict["end_date"], n_periods, resolution)
+            if forecast_labels[0] not in weather:
+                try:
+                    weather[forecast_labels[0]] = __get_forecast_weather(weather_capability, column_name, forecast_labels)
+                except ValueError as e:
+                    weather[forecast_labels[0]] = e
+            labels[meter_name] = forecast_labels
+
+        def predict(meter_name: str) -> pd.DataFrame:
+            matrix = weather[labels[meter_name][0]]
+            if isinstance(matrix, Exception):
+                raise matrix
+            alignment.check_length(matrix, n_periods, "Weather data")
+            return data_forecast.create_forecast_data(models[meter_name]["model"], n_periods, matrix)
+
+        futures = {meter_name: executor.submit(predict, meter_name) for meter_name in labels}
+
+        forecasts = {}
+        for meter_name, future in futures.items():
+            try:
+                forecasts[meter_name] = future.result()
+            except Exception as e:
+                logging.debug(f"Forecast of {meter_name} failed: {e}")
+                failed[meter_name] = str(e)
+
+    names = list(forecasts)
+    columns = ["lower_conf_values", "value", "upper_conf_values"]
+    table = pd.concat([forecasts[name] for name in names], ignore_index=True) if names else pd.DataFrame(columns=columns)
+    dates = labels[names[0]].append([labels[name] for name in names[1:]]) if names else pd.DatetimeIndex([])
+
+    data: interfaces.BulkForecastData = {
+        "timeframe": timeframe,
+        "resolution": resolution,
+        "nPeriods": n_periods,
+        "name": np.repeat(names, n_periods).tolist(),
+        "date": dates.strftime(os.getenv("DATETIME_STANDARD_FORMAT")).tolist(),
+        "value": table["value"].tolist(),
+        "lower_conf_values": table["lower_conf_values"].tolist(),
+        "upper_conf_values": table["upper_conf_values"].tolist(),
+        "failed": failed,
+    }
+
+    return data
+
+
+def __check_n_periods(n_periods: int) -> None:
+    """
+    :param n_periods: periods to forecast as requested
+    :raises ValueError: if n_periods is no positive integer
+    """
+
+    if isinstance(n_periods, bool) or not isinstance(n_periods, int) or n_periods < 1:
+        raise ValueError("nPeriods has to be a positive integer")
+
+
+def __get_forecast_weather(weather_capability: str, column_name: str,
+                           forecast_labels: pd.DatetimeIndex) -> np.ndarray | None:
+    """
+    exogenous weather columns of the forecast range, built like the training columns
+
+    :param weather_capability: capability of dwd weather, plain if none, multiple joined by exogenous.SEPARATOR
+    :param column_name: column name of dwd data, multiple joined by exogenous.SEPARATOR
+    :param forecast_labels: dates of the forecast
+    :return: float64 matrix of the weather columns, None if plain
+    """
+
+    return exogenous.build_matrix(weather_capability, column_name, forecast_labels[0], forecast_labels[-1])
+
+
 def __resample_data(data: interfaces.SelectDateValueData, resolution: str) -> interfaces.SelectDateValueData:
     """
     resamples the requested data from db using pandas
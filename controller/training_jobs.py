@@ -0,0 +1,328 @@
+import datetime
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable
+
+from dotenv import load_dotenv
+
+import interfaces
+
+__executor: ProcessPoolExecutor | None = None
+__workers: int = 0
+__jobs: dict[str, dict[str, Any]] = {}
+__pending: deque[str] = deque()
+__lock = threading.RLock()
+
+
+class QueueFullError(Exception):
+    """
+    raised when the amount of unfinished jobs reached TRAINING_QUEUE_LIMIT
+    """
+
+
+def submit_job(kind: str, name: str, function: Callable, *args: Any, batch: str | None = None) -> str:
+    """
+    enqueue a function to run inside the worker pool
+
+    :param kind: kind of job (train, ...)
+    :param name: smartmeter name the job belongs to
+    :param function: module level function to run in a worker process
+    :param args: arguments for the function, must be picklable
+    :param batch: id of the batch the job belongs to
+    :return: id of the created job
+    """
+
+    with __lock:
+        __prune_jobs()
+
+        limit = __read_int_env("TRAINING_QUEUE_LIMIT", 0)
+        if limit and len(__pending) >= limit:
+            raise QueueFullError(f"{len(__pending)} jobs are still queued (limit {limit})")
+
+        job_id = uuid.uuid4().hex
+        __jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "name": name,
+            "batch": batch,
+            "submitted": datetime.datetime.now(datetime.timezone.utc),
+            "function": function,
+            "args": args,
+            "future": None,
+            "cancelled": False,
+        }
+        __pending.append(job_id)
+
+        logging.debug(f"Job {job_id} ({kind} {name}) queued")
+
+        __dispatch()
+
+    return job_id
+
+
+def get_job(job_id: str) -> interfaces.TrainingJobData | None:
+    """
+    build the status representation of a job
+
+    :param job_id: id of the job
+    :return: dict of job information or None if unknown
+    """
+
+    with __lock:
+        job = __jobs.get(job_id)
+
+    if job is None:
+        return None
+
+    return __job_to_dict(job)
+
+
+def get_jobs() -> list[interfaces.TrainingJobData]:
+    """
+    status of every job still kept in memory
+
+    :return: list of job information, newest first
+    """
+
+    with __lock:
+        jobs = list(__jobs.values())
+
+    jobs.sort(key=lambda job: job["submitted"], reverse=True)
+
+    return [__job_to_dict(job) for job in jobs]
+
+
+def get_batch(batch_id: str) -> list[interfaces.TrainingJobData] | None:
+    """
+    status of every job of a batch
+
+    :param batch_id: id of the batch
+    :return: list of job information or None if unknown
+    """
+
+    with __lock:
+        jobs = [job for job in __jobs.values() if job["batch"] == batch_id]
+
+    if not jobs:
+        return None
+
+    return [__job_to_dict(job) for job in jobs]
+
+
+def get_job_result(job_id: str) -> Any:
+    """
+    return the result of a finished job
+
+    :param job_id: id of the job
+    :return: return value of the job function
+    """
+
+    with __lock:
+        job = __jobs[job_id]
+
+    result, _, _ = job["future"].result()
+
+    return result
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    cancel a job which has not been started yet
+
+    :param job_id: id of the job
+    :return: True if cancelled, False if the job is already running or finished
+    """
+
+    with __lock:
+        job = __jobs[job_id]
+
+        # only jobs still waiting for a free worker can be cancelled
+        cancelled = job["future"] is None and not job["cancelled"]
+        if cancelled:
+            job["cancelled"] = True
+            __pending.remove(job_id)
+
+    logging.debug(f"Cancelling job {job_id}: {cancelled}")
+
+    return cancelled
+
+
+def __job_to_dict(job: dict[str, Any]) -> interfaces.TrainingJobData:
+    """
+    map the internal job entry onto its json representation
+
+    :param job: internal job entry
+    :return: job information
+    """
+
+    future: Future | None = job["future"]
+
+    data: dict[str, Any] = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "name": job["name"],
+        "batch": job["batch"],
+        "status": __status_of(job),
+        "submitted": job["submitted"].isoformat(),
+        "started": None,
+        "duration": None,
+        "modelKey": None,
+        "error": None,
+    }
+
+    if data["status"] == "done":
+        result, started, duration = future.result()
+        data["started"] = started
+        data["duration"] = duration
+        data["modelKey"] = result if isinstance(result, str) else None
+    elif data["status"] == "failed":
+        data["error"] = str(future.exception())
+
+    return data
+
+
+def __status_of(job: dict[str, Any]) -> str:
+    """
+    map the state of a job to its status
+
+    :param job: internal job entry
+    :return: queued | running | done | failed | cancelled
+    """
+
+    future: Future | None = job["future"]
+
+    if job["cancelled"]:
+        return "cancelled"
+    if future is None:
+        return "queued"
+    if future.done():
+        return "failed" if future.exception() is not None else "done"
+    return "running"
+
+
+def get_nested_workers(key: str) -> int:
+    """
+    processes a job may start itself, jobs already run in TRAINING_WORKERS processes,
+    so all jobs together stay within the cores: at most cores // TRAINING_WORKERS (at least 1),
+    the variable key may only lower the share
+
+    :param key: environment variable of the job kind, e.g. BACKTEST_WORKERS
+    :return: amount of processes
+    """
+
+    cores = os.cpu_count() or 1
+    share = max(1, cores // max(1, __read_int_env("TRAINING_WORKERS", cores)))
+
+    return max(1, min(__read_int_env(key, share), share))
+
+
+def __dispatch(_: Future | None = None) -> None:
+    """
+    hand queued jobs to the pool while workers are free,
+    jobs are only submitted when they can start, so queued jobs stay cancellable
+
+    :param _: finished future when used as done callback
+    """
+
+    with __lock:
+        executor = __get_executor()
+        running = sum(1 for job in __jobs.values() if job["future"] is not None and not job["future"].done())
+
+        while __pending and running < __workers:
+            job = __jobs[__pending.popleft()]
+            job["future"] = executor.submit(__run_job, job["function"], *job["args"])
+            # arguments are no longer needed once handed to the pool
+            job["args"] = ()
+            running += 1
+            logging.debug(f"Job {job['id']} started")
+            job["future"].add_done_callback(__dispatch)
+
+
+def __run_job(function: Callable, *args: Any) -> tuple[Any, str, float]:
+    """
+    executed inside the worker process, measures the runtime of the job
+
+    :param function: function to run
+    :param args: arguments of the function
+    :return: result of the function, start time and duration in seconds
+    """
+
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    start_time = time.time()
+
+    result = function(*args)
+
+    return result, started, time.time() - start_time
+
+
+def __init_worker() -> None:
+    """
+    logging setup of spawned worker processes
+    """
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+def __get_executor() -> ProcessPoolExecutor:
+    """
+    lazily create the process pool, sized by TRAINING_WORKERS (default: all cores)
+
+    :return: process pool executor
+    """
+
+    global __executor, __workers
+
+    if __executor is None:
+        __workers = __read_int_env("TRAINING_WORKERS", os.cpu_count() or 1)
+        logging.debug(f"Starting training pool with {__workers} workers")
+        # spawn instead of fork, the flask process is multithreaded
+        __executor = ProcessPoolExecutor(max_workers=__workers,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=__init_worker)
+
+    return __executor
+
+
+def __prune_jobs() -> None:
+    """
+    forget the oldest finished jobs when more than TRAINING_JOB_HISTORY are kept
+    """
+
+    history = __read_int_env("TRAINING_JOB_HISTORY", 1000)
+    finished = [job for job in __jobs.values()
+                if job["cancelled"] or (job["future"] is not None and job["future"].done())]
+
+    if len(finished) <= history:
+        return
+
+    finished.sort(key=lambda job: job["submitted"])
+    for job in finished[:len(finished) - history]:
+        del __jobs[job["id"]]
+
+
+def __read_int_env(key: str, default: int) -> int:
+    """
+    read an integer environment variable
+
+    :param key: name of the variable
+    :param default: value if unset or empty
+    :return: parsed value
+    """
+
+    load_dotenv()
+    value = os.getenv(key)
+
+    return int(value) if value else default
@@ -1,7 +1,14 @@
+import datetime
+import io
 import logging
+import os
 import sys
+import time
 
-from database import db_connector, file_reader
+import pandas as pd
+from dotenv import load_dotenv
+
+from database import data_selector, db_connector, file_reader
 
 # logger setup
 logging.basicConfig(
@@ -13,6 +20,28 @@ logging.basicConfig(
     ]
 )
 
+PROGRESS_TABLE = ("CREATE TABLE IF NOT EXISTS timeseries.water_demand_ingest_progress (source TEXT PRIMARY KEY, "
+                  "rows_done BIGINT NOT NULL, updated TIMESTAMPTZ NOT NULL);")
+
+VERSION_TABLE = ("CREATE TABLE IF NOT EXISTS timeseries.schema_version (version INTEGER PRIMARY KEY, "
+                 "description TEXT NOT NULL, applied TIMESTAMPTZ NOT NULL);")
+
+# schema changes applied in order by migrate(), append new steps, never change applied ones
+MIGRATIONS = [
+    (1, "index for range scans of one smartmeter",
+     ["CREATE INDEX IF NOT EXISTS water_demand_prediction_name_date_idx "
+      "ON timeseries.water_demand_prediction (name, date DESC);"]),
+    (2, "smartmeter dimension table",
+     ["CREATE TABLE IF NOT EXISTS timeseries.meters (name TEXT PRIMARY KEY, first_date TIMESTAMPTZ NOT NULL, "
+      "last_date TIMESTAMPTZ NOT NULL);",
+      "INSERT INTO timeseries.meters (name, first_date, last_date) "
+      "SELECT name, min(date), max(date) FROM timeseries.water_demand_prediction GROUP BY name "
+      "ON CONFLICT (name) DO NOTHING;"]),
+]
+
+# raw chunks have to outlive the refresh window of the weekly rollup, otherwise dropped rows would be refreshed away
+MIN_RETENTION_DAYS = 42
+
 def create_table() -> None:
     """
     create the database table
@@ -22,10 +51,11 @@ def create_table() -> None:
     table_string = (f"CREATE TABLE IF NOT EXISTS timeseries.water_demand_prediction (date TIMESTAMPTZ NOT NULL, "
                     f"name TEXT NOT NULL, value DOUBLE PRECISION NOT NULL, PRIMARY KEY (date, name, value));")
 
-    with db_connector.create_connection() as connection:
+    with db_connector.get_connection() as connection:
         with connection.cursor() as cursor:
             # execute creation
             cursor.execute(table_string)
+            cursor.execute(PROGRESS_TABLE)
             logging.debug("Table created!")
 
 def create_hypertable() ->  None:
@@ -33,30 +63,308 @@ def create_hypertable() ->  None:
     create a hypertable from the main table, to fasten searching
     :return: none
     """
-    with db_connector.create_connection() as connection:
+    with db_connector.get_connection() as connection:
         with connection.cursor() as cursor:
             cursor.execute("SELECT create_hypertable('timeseries.water_demand_prediction', by_range('date'));")
             logging.debug("Hypertable initialized!")
 
+def migrate() -> None:
+    """
+    apply the schema changes of MIGRATIONS which are newer than the version stored in timeseries.schema_version,
+    every step is committed together with its version
+    :return: None
+    """
+
+    with db_connector.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(VERSION_TABLE)
+            cursor.execute("SELECT coalesce(max(version), 0) FROM timeseries.schema_version")
+            current_version = cursor.fetchone()[0]
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        with db_connector.get_connection() as connection:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO timeseries.schema_version (version, description, applied) "
+                               "VALUES (%s, %s, now())", (version, description))
+
+        logging.debug(f"Schema migrated to version {version}: {description}")
+
+def configure_storage_policies() -> None:
+    """
+    enable columnar compression per smartmeter on the hypertable,
+    compress chunks older than COMPRESS_AFTER_DAYS (default 30) and drop raw chunks older than RETENTION_DAYS
+    (kept forever if not set), the rollups of create_continuous_aggregates keep the dropped history downsampled.
+    Compressed chunks are decompressed transparently when selected
+    :return: None
+    """
+
+    load_dotenv()
+    compress_after = int(os.getenv("COMPRESS_AFTER_DAYS") or 30)
+    retention = __read_retention_days()
+
+    with db_connector.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT compression_enabled FROM timescaledb_information.hypertables "
+                           "WHERE hypertable_schema = 'timeseries' AND hypertable_name = 'water_demand_prediction'")
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("timeseries.water_demand_prediction is no hypertable, run create_hypertable first")
+
+            # the settings can not be changed while compressed chunks exist, so they are only set once
+            if not row[0]:
+                # value is part of the primary key, unique constraints have to be covered by segmentby and orderby
+                cursor.execute("ALTER TABLE timeseries.water_demand_prediction SET (timescaledb.compress, "
+                               "timescaledb.compress_segmentby = 'name', "
+                               "timescaledb.compress_orderby = 'date DESC, value');")
+                logging.debug("Compression enabled!")
+
+            cursor.execute("SELECT remove_compression_policy('timeseries.water_demand_prediction', if_exists => true);")
+            cursor.execute("SELECT add_compression_policy('timeseries.water_demand_prediction', "
+                           "compress_after => make_interval(days => %s));", (compress_after,))
+            logging.debug(f"Compression policy set to {compress_after} days!")
+
+            cursor.execute("SELECT remove_retention_policy('timeseries.water_demand_prediction', if_exists => true);")
+            if retention:
+                cursor.execute("SELECT add_retention_policy('timeseries.water_demand_prediction', "
+                               "drop_after => make_interval(days => %s));", (int(retention),))
+                logging.debug(f"Retention policy set to {retention} days!")
+
+def create_continuous_aggregates() -> None:
+    """
+    create the hourly, daily and weekly rollups of the hypertable (data_selector.ROLLUPS) with refresh policies,
+    every bucket keeps sum and count so the rollups can be summed up to other buckets.
+    The weekly rollup is built on the daily one, recent rows which are not materialized yet are added at query time
+    :return: None
+    """
+
+    hourly, _ = data_selector.ROLLUPS["hourly"]
+    daily, _ = data_selector.ROLLUPS["daily"]
+    weekly, _ = data_selector.ROLLUPS["weekly"]
+
+    views = [
+        (hourly, "SELECT time_bucket('1 hour', date) AS date, name, sum(value) AS value_sum, count(*) AS value_count "
+                 "FROM timeseries.water_demand_prediction GROUP BY 1, name", "3 days", "1 hour", "30 minutes"),
+        (daily, "SELECT time_bucket('1 day', date) AS date, name, sum(value) AS value_sum, count(*) AS value_count "
+                "FROM timeseries.water_demand_prediction GROUP BY 1, name", "7 days", "1 hour", "1 hour"),
+        (weekly, f"SELECT time_bucket('7 days', date) AS date, name, sum(value_sum) AS value_sum, "
+                 f"sum(value_count) AS value_count FROM {daily} GROUP BY 1, name", "35 days", "1 day", "1 day"),
+    ]
+
+    with db_connector.get_connection() as connection:
+        # continuous aggregates can not be created or refreshed inside a transaction
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                for view, select, start_offset, end_offset, schedule in views:
+                    cursor.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} WITH (timescaledb.continuous, "
+                                   f"timescaledb.materialized_only = false) AS {select} WITH NO DATA;")
+                    cursor.execute("SELECT add_continuous_aggregate_policy(%s, start_offset => %s::interval, "
+                                   "end_offset => %s::interval, schedule_interval => %s::interval, if_not_exists => true);",
+                                   (view, start_offset, end_offset, schedule))
+                    # regions of dropped raw chunks would be materialized empty
+                    cursor.execute("CALL refresh_continuous_aggregate(%s, %s::timestamptz, NULL);",
+                                   (view, __retention_start()))
+                    logging.debug(f"Continuous aggregate {view} created!")
+        finally:
+            connection.autocommit = False
+
+def refresh_continuous_aggregates(start_date: datetime.datetime, end_date: datetime.datetime) -> None:
+    """
+    materialize the buckets of inserted rows,
+    the policies only refresh recent buckets, so inserted history has to be refreshed explicitly.
+    The window never reaches back before RETENTION_DAYS, regions of dropped raw chunks would be materialized empty
+    and the rollups would lose the history they keep
+    :param start_date: first inserted date
+    :param end_date: last inserted date
+    :return: None
+    """
+
+    retention_start = __retention_start()
+
+    with db_connector.get_connection() as connection:
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                for view, interval in data_selector.ROLLUPS.values():
+                    # only buckets which are completely inside the window are refreshed
+                    bucket = pd.Timedelta(interval).to_pytimedelta()
+                    window_start = start_date - bucket
+                    if retention_start is not None:
+                        window_start = max(window_start, retention_start)
+                    window_end = end_date + bucket
+
+                    if window_start >= window_end:
+                        continue
+
+                    cursor.execute("CALL refresh_continuous_aggregate(%s, %s::timestamptz, %s::timestamptz);",
+                                   (view, window_start, window_end))
+                    logging.debug(f"Continuous aggregate {view} refreshed from {window_start} to {window_end}!")
+        finally:
+            connection.autocommit = False
+
 def insert_data() -> None:
     """
-    insert data based on files in smartmeterdata
+    insert data based on files in smartmeterdata,
+    every file is read in chunks of INSERT_BATCH_SIZE rows which are streamed via COPY into a staging table
+    and moved into the main table skipping rows which already exist.
+    Every batch commits its progress, a restarted insert continues after the last committed batch.
     :return: None
     """
 
-    # read in whole json data
-    df = file_reader.format_smartmeter_data()
+    load_dotenv()
+    batch_size = int(os.getenv("INSERT_BATCH_SIZE") or 100000)
+
+    with db_connector.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(PROGRESS_TABLE)
+
+    migrate()
+
+    inserted_ranges = [__insert_file(path, batch_size) for path in file_reader.get_smartmeter_data_paths()]
+    inserted_ranges = [inserted_range for inserted_range in inserted_ranges if inserted_range is not None]
+
+    if inserted_ranges and data_selector.has_rollups():
+        refresh_continuous_aggregates(min(start for start, _ in inserted_ranges),
+                                      max(end for _, end in inserted_ranges))
+
+
+def __read_retention_days() -> int | None:
+    """
+    :return: RETENTION_DAYS, None if raw chunks are kept forever
+    :raises ValueError: if the retention is shorter than MIN_RETENTION_DAYS
+    """
+
+    load_dotenv()
+    retention = os.getenv("RETENTION_DAYS")
+
+    if retention and int(retention) < MIN_RETENTION_DAYS:
+        raise ValueError(f"RETENTION_DAYS has to be at least {MIN_RETENTION_DAYS}")
+
+    return int(retention) if retention else None
+
+
+def __retention_start() -> datetime.datetime | None:
+    """
+    :return: oldest date which is kept by the retention policy, None if raw chunks are kept forever
+    """
+
+    retention = __read_retention_days()
+    if retention is None:
+        return None
+
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=retention)
+
+
+def __insert_file(path: str, batch_size: int) -> tuple[datetime.datetime, datetime.datetime] | None:
+    """
+    insert one data file batch by batch, resuming after the rows already processed
+
+    :param path: path of the data file
+    :param batch_size: rows per COPY batch
+    :return: first and last date of the copied rows, None if every batch was committed before
+    """
 
-    insert_string = f"INSERT INTO timeseries.water_demand_prediction (date, name, value) VALUES (%s, %s, %s)"
+    source = __create_source_key(path)
 
-    with db_connector.create_connection() as connection:
+    with db_connector.get_connection() as connection:
         with connection.cursor() as cursor:
-            # iterate through every row in df
-            for row in df.itertuples(name=None):
-                # ignore index row[0]
-                cursor.execute(insert_string, (row[1], row[2], row[3]))
-                logging.debug(f"Row {row[0] + 1}_{row[1]}_{row[2]}_{row[3]} inserted!")
+            cursor.execute("SELECT rows_done FROM timeseries.water_demand_ingest_progress WHERE source=%s", (source,))
+            row = cursor.fetchone()
+
+    rows_done = row[0] if row else 0
+    if rows_done:
+        logging.info(f"Resuming insert of {source} after {rows_done} rows")
+
+    offset, first_row, start_time = 0, rows_done, time.time()
+    first_date, last_date = None, None
+
+    for batch in file_reader.iter_smartmeter_data(path, batch_size):
+        end = offset + len(batch)
+
+        # skip batches committed by a previous run
+        if end > rows_done:
+            batch = batch.iloc[max(rows_done - offset, 0):]
+            inserted = __copy_batch(batch, source, end)
+            rows_done = end
+
+            dates = batch.iloc[:, 0]
+            first_date = dates.min() if first_date is None else min(first_date, dates.min())
+            last_date = dates.max() if last_date is None else max(last_date, dates.max())
+
+            rows_per_second = (rows_done - first_row) / max(time.time() - start_time, 1e-9)
+            logging.info(f"{source}: {rows_done} rows processed ({inserted} new), {rows_per_second:.0f} rows/s")
+
+        offset = end
+
+    logging.info(f"Insert of {source} finished")
+
+    if first_date is None:
+        return None
+
+    return first_date.to_pydatetime(), last_date.to_pydatetime()
+
+
+def __copy_batch(batch: pd.DataFrame, source: str, rows_done: int) -> int:
+    """
+    copy one batch into the main table and store the progress in the same transaction
+
+    :param batch: formatted smartmeter data (date, name, value)
+    :param source: key of the inserted file
+    :param rows_done: rows of the file processed after this batch
+    :return: amount of rows which did not exist before
+    """
+
+    buffer = io.StringIO()
+    batch.to_csv(buffer, header=False, index=False, date_format="%Y-%m-%d %H:%M:%S%z")
+
+    with db_connector.get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS water_demand_staging "
+                           "(date TIMESTAMPTZ NOT NULL, name TEXT NOT NULL, value DOUBLE PRECISION NOT NULL) "
+                           "ON COMMIT DELETE ROWS")
+
+            with cursor.copy("COPY water_demand_staging (date, name, value) FROM STDIN (FORMAT csv)") as copy:
+                copy.write(buffer.getvalue())
+
+            cursor.execute("INSERT INTO timeseries.water_demand_prediction (date, name, value) "
+                           "SELECT date, name, value FROM water_demand_staging ON CONFLICT DO NOTHING")
+            inserted = cursor.rowcount
+
+            cursor.execute("INSERT INTO timeseries.meters (name, first_date, last_date) "
+                           "SELECT name, min(date), max(date) FROM water_demand_staging GROUP BY name "
+                           "ON CONFLICT (name) DO UPDATE SET first_date = least(meters.first_date, EXCLUDED.first_date), "
+                           "last_date = greatest(meters.last_date, EXCLUDED.last_date)")
+
+            cursor.execute("INSERT INTO timeseries.water_demand_ingest_progress (source, rows_done, updated) "
+                           "VALUES (%s, %s, now()) ON CONFLICT (source) "
+                           "DO UPDATE SET rows_done = EXCLUDED.rows_done, updated = EXCLUDED.updated",
+                           (source, rows_done))
+
+    return inserted
+
+
+def __create_source_key(path: str) -> str:
+    """
+    identify a data file by name, size and modification time,
+    so the progress of a replaced file is not reused
+
+    :param path: path of the data file
+    :return: key of the file
+    """
+
+    stat = os.stat(path)
+
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
 
 #create_table()
 #create_hypertable()
+#migrate()
+#configure_storage_policies()
+#create_continuous_aggregates()
 #insert_data()
\ No newline at end of file
@@ -1,5 +1,7 @@
 import datetime
+import logging
 
+import numpy as np
 import psycopg
 from dotenv import load_dotenv
 
@@ -7,6 +9,30 @@ import interfaces
 from database import db_connector
 from psycopg.rows import dict_row
 
+# continuous aggregates and bucket widths per resolution, matching the pandas resample rules of the service
+ROLLUPS = {
+    "hourly": ("timeseries.water_demand_hourly", "1 hour"),
+    "daily": ("timeseries.water_demand_daily", "1 day"),
+    "weekly": ("timeseries.water_demand_weekly", "7 days"),
+}
+
+# first day of the weekly buckets of time_bucket without origin
+WEEK_ORIGIN = datetime.date(2000, 1, 3)
+
+# layout of binary COPY rows of (date, value) and (meter index, date, value), big endian,
+# every field is preceded by its length, timestamps are microseconds since 2000-01-01 UTC
+DATE_VALUE_ROW = np.dtype([("fields", ">i2"), ("date_length", ">i4"), ("date", ">i8"),
+                           ("value_length", ">i4"), ("value", ">f8")])
+INDEX_DATE_VALUE_ROW = np.dtype([("fields", ">i2"), ("index_length", ">i4"), ("index", ">i4"),
+                                 ("date_length", ">i4"), ("date", ">i8"),
+                                 ("value_length", ">i4"), ("value", ">f8")])
+POSTGRES_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+
+__has_timescale: bool | None = None
+__has_rollups: bool | None = None
+# only a found table is cached, the table is created by migrations while the service runs
+__has_meters_table: bool = False
+
 
 def query_fetch_one(query_string: str, params: list[str | datetime.datetime]) -> interfaces.FetchOneQueryDict | None:
     """
@@ -15,34 +41,250 @@ def query_fetch_one(query_string: str, params: list[str | datetime.datetime]) ->
     :param params: lst of parameters
     :return: dict of results or None if None
     """
-    with db_connector.create_connection() as connection:
+    with db_connector.get_connection() as connection:
         with connection.cursor(row_factory=psycopg.rows.dict_row) as cursor:
             query = query_string
             cursor.execute(query, (tuple(params)))
             result = cursor.fetchone()
             return result
 
-def select_date_value(meter_name: str, start: datetime.datetime, end: datetime.datetime) -> interfaces.SelectDateValueData | None:
+def query_fetch_all(query_string: str, params: list[str | list[str] | datetime.datetime]) -> list[dict] | None:
+    """
+    fetch all function to use when querying data of multiple rows
+    :param query_string: select string to use
+    :param params: lst of parameters
+    :return: list of dicts of results
     """
-    request data from db
+    with db_connector.get_connection() as connection:
+        with connection.cursor(row_factory=psycopg.rows.dict_row) as cursor:
+            query = query_string
+            cursor.execute(query, (tuple(params)))
+            result = cursor.fetchall()
+            return result
+
+def select_date_value(meter_name: str, start: datetime.datetime, end: datetime.datetime,
+                      resolution: str | None = None) -> interfaces.SelectDateValueData | None:
+    """
+    request data from db, aggregated to the resolution inside the db if timescale is available
+    (see has_timescale), raw records otherwise
     
     :param meter_name: name of smartmeter
     :param start: unix time of first record
     :param end: unix time of last record
+    :param resolution: hourly, daily or weekly, None for the raw records
     :return: dict or None of results
     """
+    if resolution is not None:
+        if resolution not in ROLLUPS:
+            raise ValueError("Unsupported resolution")
+        if has_timescale():
+            return __select_aggregated_date_value(meter_name, start, end, resolution)
+
     load_dotenv()
     query_string = "SELECT array_agg(value ORDER BY date) AS value, array_agg(date ORDER by date) AS date FROM timeseries.water_demand_prediction WHERE name=%s AND date BETWEEN %s AND %s"
 
     return query_fetch_one(query_string, [meter_name, start, end])
 
+def __select_aggregated_date_value(meter_name: str, start: datetime.datetime, end: datetime.datetime, resolution: str) -> interfaces.SelectDateValueData | None:
+    """
+    mean values per bucket, buckets start at midnight of the first day like the pandas resampling.
+    Pre-aggregated rows of the continuous aggregates are read when they exist,
+    otherwise the raw records are grouped with time_bucket.
+    Only the same records as with the raw records are aggregated: a rollup row is read if its bucket lies
+    completely inside start to end, the parts of the range before and after are read from finer rollups
+    and the partial hours at the edges from the raw records
+
+    :param meter_name: name of smartmeter
+    :param start: unix time of first record
+    :param end: unix time of last record
+    :param resolution: hourly, daily or weekly
+    :return: dict of bucket starts and mean values
+    """
+    _, interval = ROLLUPS[resolution]
+    origin = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    raw_source = ("SELECT date, value AS value_sum, 1 AS value_count FROM timeseries.water_demand_prediction "
+                  "WHERE name=%s AND date >= %s AND date < %s")
+
+    if has_rollups():
+        # coarsest first, the weekly rollup starts its weeks on mondays and only matches weeks starting on a monday
+        levels = {"hourly": ["hourly"], "daily": ["daily", "hourly"], "weekly": ["weekly", "daily", "hourly"]}[resolution]
+        if resolution == "weekly" and (origin.date() - WEEK_ORIGIN).days % 7 != 0:
+            levels = levels[1:]
+
+        # records up to end are included, timestamps have a resolution of microseconds
+        pieces = __split_range(start, end + datetime.timedelta(microseconds=1), levels)
+        sources, params = [], []
+        for level, piece_start, piece_end in pieces:
+            view = ROLLUPS[level][0] if level != "raw" else None
+            sources.append(raw_source if view is None else
+                           f"SELECT date, value_sum, value_count FROM {view} WHERE name=%s AND date >= %s AND date < %s")
+            params += [meter_name, piece_start, piece_end]
+        source = " UNION ALL ".join(sources)
+    else:
+        source = raw_source
+        params = [meter_name, start, end + datetime.timedelta(microseconds=1)]
+
+    query_string = ("SELECT array_agg(value ORDER BY date) AS value, array_agg(date ORDER BY date) AS date FROM "
+                    "(SELECT time_bucket(%s::interval, date, %s::timestamptz) AS date, "
+                    f"sum(value_sum) / sum(value_count) AS value FROM ({source}) AS source GROUP BY 1) AS buckets")
+
+    return query_fetch_one(query_string, [interval, origin] + params)
+
+def __split_range(start: datetime.datetime, end: datetime.datetime,
+                  levels: list[str]) -> list[tuple[str, datetime.datetime, datetime.datetime]]:
+    """
+    split a range into the parts read from each rollup, every rollup covers the buckets lying completely inside
+    the range which are not covered by a coarser one, the rest is read from the raw records.
+    The buckets of all rollups start on the same grid (mondays, midnights, full hours), so the covered parts are nested
+
+    :param start: first date of the range
+    :param end: date after the range
+    :param levels: resolutions of the rollups to read, coarsest first
+    :return: (resolution or raw, start, end) of every non empty part
+    """
+
+    grid_origin = datetime.datetime.combine(WEEK_ORIGIN, datetime.time(), tzinfo=start.tzinfo)
+    widths = {"hourly": datetime.timedelta(hours=1), "daily": datetime.timedelta(days=1),
+              "weekly": datetime.timedelta(days=7)}
+
+    pieces = []
+    inner = None
+    for level in levels + ["raw"]:
+        if level == "raw":
+            outer = (start, end)
+        else:
+            width = widths[level]
+            outer = (grid_origin - ((grid_origin - start) // width) * width,
+                     grid_origin + ((end - grid_origin) // width) * width)
+            if outer[0] >= outer[1]:
+                continue
+
+        if inner is None:
+            pieces.append((level, outer[0], outer[1]))
+        else:
+            pieces += [(level, outer[0], inner[0]), (level, inner[1], outer[1])]
+        inner = outer
+
+    return [piece for piece in pieces if piece[1] < piece[2]]
+
+def has_timescale() -> bool:
+    """
+    check once per process whether the timescaledb extension is installed
+
+    :return: True if time_bucket can be used
+    """
+    global __has_timescale
+
+    if __has_timescale is None:
+        result = query_fetch_one("SELECT count(*) > 0 AS installed FROM pg_extension WHERE extname=%s", ["timescaledb"])
+        __has_timescale = bool(result and result["installed"])
+
+    return __has_timescale
+
+def has_rollups() -> bool:
+    """
+    check once per process whether the continuous aggregates of data_inserter.create_continuous_aggregates exist
+
+    :return: True if the rollups can be read
+    """
+    global __has_rollups
+
+    if __has_rollups is None:
+        views = [view for view, _ in ROLLUPS.values()]
+        result = query_fetch_one("SELECT bool_and(to_regclass(rollup) IS NOT NULL) AS created FROM unnest(%s::text[]) AS rollup",
+                                 [views])
+        __has_rollups = bool(result and result["created"])
+
+    return __has_rollups
+
+def select_date_value_arrays(meter_name: str, start: datetime.datetime, end: datetime.datetime) -> interfaces.DateValueArrays:
+    """
+    request data from db as numpy arrays, the rows are transferred with binary COPY
+    and read into the arrays without creating python objects per record
+
+    :param meter_name: name of smartmeter
+    :param start: unix time of first record
+    :param end: unix time of last record
+    :return: dict of datetime64 (UTC) and float64 arrays, empty if there are no records
+    """
+    query_string = ("COPY (SELECT date, value FROM timeseries.water_demand_prediction "
+                    "WHERE name=%s AND date BETWEEN %s AND %s ORDER BY date) TO STDOUT (FORMAT BINARY)")
+
+    rows = __copy_binary(query_string, [meter_name, start, end], DATE_VALUE_ROW)
+
+    return {"date": POSTGRES_EPOCH + rows["date"].astype("timedelta64[us]"), "value": rows["value"].astype(np.float64)}
+
+def select_date_value_arrays_of_meters(meter_names: list[str], start: datetime.datetime, end: datetime.datetime) -> dict[str, interfaces.DateValueArrays]:
+    """
+    request data of multiple smartmeters as numpy arrays in one binary COPY,
+    rows are ordered by smartmeter so every smartmeter is a slice of the transferred arrays
+
+    :param meter_names: names of smartmeters
+    :param start: unix time of first record
+    :param end: unix time of last record
+    :return: dict of arrays by smartmeter name, meters without data are missing
+    """
+    query_string = ("COPY (SELECT array_position(%s::text[], name) - 1, date, value FROM timeseries.water_demand_prediction "
+                    "WHERE name = ANY(%s) AND date BETWEEN %s AND %s ORDER BY 1, date) TO STDOUT (FORMAT BINARY)")
+
+    rows = __copy_binary(query_string, [meter_names, meter_names, start, end], INDEX_DATE_VALUE_ROW)
+
+    dates = POSTGRES_EPOCH + rows["date"].astype("timedelta64[us]")
+    values = rows["value"].astype(np.float64)
+    indices = rows["index"].astype(np.int64)
+
+    # borders of the sorted smartmeter indices
+    meters, starts = np.unique(indices, return_index=True)
+    ends = np.append(starts[1:], len(indices))
+
+    return {meter_names[meter]: {"date": dates[first:last], "value": values[first:last]}
+            for meter, first, last in zip(meters, starts, ends)}
+
+def __copy_binary(query_string: str, params: list, row_type: np.dtype) -> np.ndarray:
+    """
+    run a binary COPY TO STDOUT and view the received rows as structured array
+
+    :param query_string: COPY statement of fixed size, not nullable columns
+    :param params: lst of parameters
+    :param row_type: layout of one row including the field count and lengths
+    :return: structured array of the rows
+    """
+    buffer = bytearray()
+
+    with db_connector.get_connection() as connection:
+        with connection.cursor() as cursor:
+            with cursor.copy(query_string, tuple(params)) as copy:
+                for block in copy:
+                    buffer += block
+
+    # signature (11 bytes), flags (4 bytes), length of the header extension (4 bytes) and the extension
+    header_length = 19 + int.from_bytes(buffer[15:19], "big")
+    # every row starts with its field count, the trailer is a field count of -1
+    body = memoryview(buffer)[header_length:len(buffer) - 2]
+
+    if len(body) % row_type.itemsize:
+        raise ValueError("Unexpected row size of binary COPY")
+
+    return np.frombuffer(body, dtype=row_type)
+
 def select_names() -> dict[str: list[str]] | None:
     """
-    request names of data from db, based on first timestamp (currently)
+    request names of all smartmeters from the meters table (see data_inserter.migrate),
+    databases which are not migrated yet are scanned for the distinct names
     
     :return: dict of names
     """
-    search_date = "2021-05-26 00:00:00"
-    search_string = "SELECT array_agg(name ORDER BY date) as names FROM timeseries.water_demand_prediction WHERE date=%s"
-    return query_fetch_one(search_string, [search_date])
+    global __has_meters_table
+
+    if not __has_meters_table:
+        result = query_fetch_one("SELECT to_regclass('timeseries.meters') IS NOT NULL AS created", [])
+        __has_meters_table = bool(result and result["created"])
+
+    if not __has_meters_table:
+        logging.warning("timeseries.meters does not exist, run data_inserter.migrate to serve the names from it")
+        search_string = ("SELECT coalesce(array_agg(DISTINCT name ORDER BY name), '{}') AS names "
+                         "FROM timeseries.water_demand_prediction")
+        return query_fetch_one(search_string, [])
 
+    search_string = "SELECT coalesce(array_agg(name ORDER BY name), '{}') AS names FROM timeseries.meters"
+    return query_fetch_one(search_string, [])
@@ -1,9 +1,22 @@
 import psycopg
 from psycopg import Connection
+from psycopg.pq import TransactionStatus
 import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
 from dotenv import load_dotenv
 import logging
 
+__idle: list[tuple[Connection, float]] = []
+__open: int = 0
+__pid: int | None = None
+__config: dict[str, int | float] = {"min_size": 0, "max_size": 0, "timeout": 0.0, "max_idle": 0.0, "check_after": 0.0}
+__stats: dict[str, int | float] = {"requests": 0, "waits": 0, "timeouts": 0, "waitTime": 0.0, "maxWaitTime": 0.0}
+__lock = threading.Lock()
+__available = threading.Condition(__lock)
+
 
 def create_connection() -> Connection | None:
     """
@@ -28,3 +41,234 @@ def create_connection() -> Connection | None:
         raise Exception(f"Database connection failed")
 
 
+class PoolTimeout(Exception):
+    """
+    raised when no pooled connection became available in DB_POOL_TIMEOUT seconds
+    """
+
+
+@contextmanager
+def get_connection() -> Iterator[Connection]:
+    """
+    borrow a connection of the process wide connection pool,
+    commits when the block succeeds and rolls back otherwise, the connection is returned afterwards
+
+    :return: connection object
+    """
+
+    connection = __acquire()
+
+    try:
+        yield connection
+        if not connection.closed:
+            connection.commit()
+    except Exception:
+        if not connection.closed:
+            connection.rollback()
+        raise
+    finally:
+        __release(connection)
+
+
+def get_pool_stats() -> dict[str, int | float]:
+    """
+    wait time and saturation metrics of the connection pool
+
+    :return: dict of pool metrics
+    """
+
+    with __lock:
+        stats = dict(__stats)
+        stats["open"] = __open
+        stats["idle"] = len(__idle)
+        stats["inUse"] = __open - len(__idle)
+        stats["minSize"] = __config["min_size"]
+        stats["maxSize"] = __config["max_size"]
+        stats["saturation"] = stats["inUse"] / __config["max_size"] if __config["max_size"] else 0.0
+        stats["meanWaitTime"] = stats["waitTime"] / stats["requests"] if stats["requests"] else 0.0
+
+    return stats
+
+
+def __acquire() -> Connection:
+    """
+    take an idle connection, open a new one below DB_POOL_MAX_SIZE or wait for a returned one.
+    Idle connections are checked and new ones are opened without holding the lock,
+    a slow database does not block the other threads returning or taking connections
+
+    :return: healthy connection
+    """
+
+    global __open
+
+    request_time = time.monotonic()
+    deadline = None
+
+    with __available:
+        __check_process()
+        __stats["requests"] += 1
+
+    while True:
+        with __available:
+            while True:
+                if __idle:
+                    # the popped connection stays counted as open, it is borrowed while it is checked
+                    connection, idle_since = __idle.pop()
+                    idle_time = time.monotonic() - idle_since
+                    expired = idle_time > __config["max_idle"] and __open > __config["min_size"]
+                    break
+
+                if __open < __config["max_size"]:
+                    # reserve the slot, the connection is opened without holding the lock
+                    __open += 1
+                    connection = None
+                    break
+
+                if deadline is None:
+                    __stats["waits"] += 1
+                    deadline = request_time + __config["timeout"]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not __available.wait(remaining):
+                    if not __idle and __open >= __config["max_size"]:
+                        __stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available after {__config['timeout']}s")
+
+        if connection is None:
+            break
+
+        if not expired and __is_usable(connection, idle_time):
+            with __available:
+                __record_wait(request_time)
+            return connection
+
+        __close(connection)
+        with __available:
+            __open -= 1
+            __available.notify()
+
+    try:
+        connection = create_connection()
+    except Exception:
+        with __available:
+            __open -= 1
+            __available.notify()
+        raise
+
+    with __available:
+        __record_wait(request_time)
+
+    return connection
+
+
+def __release(connection: Connection) -> None:
+    """
+    give a borrowed connection back to the pool, broken connections are discarded
+
+    :param connection: borrowed connection
+    """
+
+    global __open
+
+    with __available:
+        if connection.closed or connection.info.transaction_status != TransactionStatus.IDLE:
+            __open -= 1
+            __close(connection)
+        else:
+            __idle.append((connection, time.monotonic()))
+
+        # close connections idle longer than DB_POOL_MAX_IDLE as long as more than DB_POOL_MIN_SIZE are open
+        now = time.monotonic()
+        while __idle and __open > __config["min_size"] and now - __idle[0][1] > __config["max_idle"]:
+            expired, _ = __idle.pop(0)
+            __open -= 1
+            __close(expired)
+
+        __available.notify()
+
+
+def __is_usable(connection: Connection, idle_time: float) -> bool:
+    """
+    health check of an idle connection, a query is only sent
+    when the connection was idle longer than DB_POOL_CHECK_AFTER, lock must not be held
+
+    :param connection: idle connection
+    :param idle_time: seconds since the connection was returned
+    :return: True if the connection can be used
+    """
+
+    if connection.closed:
+        return False
+    if idle_time > __config["check_after"]:
+        try:
+            connection.execute("SELECT 1")
+            connection.rollback()
+        except Exception as error:
+            logging.debug(f"Pooled connection failed health check: {error}")
+            return False
+
+    return True
+
+
+def __record_wait(request_time: float) -> None:
+    """
+    add the time spent acquiring a connection to the stats, lock must be held
+
+    :param request_time: monotonic time of the request
+    """
+
+    wait_time = time.monotonic() - request_time
+    __stats["waitTime"] += wait_time
+    __stats["maxWaitTime"] = max(__stats["maxWaitTime"], wait_time)
+
+
+def __close(connection: Connection) -> None:
+    """
+    close a connection, errors of already broken connections are ignored
+
+    :param connection: connection to close
+    """
+
+    try:
+        connection.close()
+    except Exception as error:
+        logging.debug(f"Closing pooled connection failed: {error}")
+
+
+def __check_process() -> None:
+    """
+    connections must not be shared between processes, a forked child starts with an empty pool,
+    lock must be held
+    """
+
+    global __pid, __open
+
+    if __pid != os.getpid():
+        __pid = os.getpid()
+        __idle.clear()
+        __open = 0
+        __config.update(__read_config())
+        logging.debug(f"Database pool configured: {__config}")
+
+
+def __read_config() -> dict[str, int | float]:
+    """
+    read DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE and DB_POOL_CHECK_AFTER,
+    sizes apply per process
+
+    :return: pool configuration
+    """
+
+    load_dotenv()
+
+    def read(key: str, default: float) -> float:
+        value = os.getenv(key)
+        return float(value) if value else default
+
+    return {
+        "min_size": int(read("DB_POOL_MIN_SIZE", 1)),
+        "max_size": int(read("DB_POOL_MAX_SIZE", 4)),
+        "timeout": read("DB_POOL_TIMEOUT", 30.0),
+        "max_idle": read("DB_POOL_MAX_IDLE", 600.0),
+        "check_after": read("DB_POOL_CHECK_AFTER", 30.0),
+    }
@@ -1,30 +1,78 @@
+import glob
+import json
 import os
+import re
+from typing import Any, IO, Iterator
+
 import pandas as pd
 from root_file import ROOT_DIR
 from dotenv import load_dotenv
 
+COLUMNS = ["dateObserved", "refDevice", "numValue"]
+
+# whitespace and separators between the objects of a json array
+__SEPARATORS = re.compile(r"[\s,]*")
+
 
 def format_smartmeter_data() -> pd.DataFrame:
-    df = __read_smartmeter_data(False)
+    """
+    read and format every smartmeter data file at once,
+    use iter_smartmeter_data for large files
 
-    # filter out unnecessary columns
-    df = df[["dateObserved", "refDevice", "numValue"]]
+    :return: df containing date, name and value
+    """
 
-    # shorten name handle
-    device_prefix = os.getenv("DEVICE_PREFIX")
-    df["refDevice"] = df["refDevice"].apply(lambda x: x.replace(device_prefix, ""))
+    chunks = [chunk for path in get_smartmeter_data_paths() for chunk in iter_smartmeter_data(path)]
 
-    # add timezone information (none, because of utc)
-    df["dateObserved"] = pd.to_datetime(df["dateObserved"], utc=True)
+    if not chunks:
+        return pd.DataFrame(columns=COLUMNS)
 
-    return df
+    return pd.concat(chunks, ignore_index=True)
+
+
+def iter_smartmeter_data(path: str, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """
+    read a json array or json lines file incrementally,
+    only chunk_size records are held in memory at once
+
+    :param path: path of the data file
+    :param chunk_size: amount of records per yielded df
+    :return: formatted dfs containing date, name and value
+    """
 
-def __read_smartmeter_data(meta_check: bool) -> pd.DataFrame:
+    with open(path, "r", encoding="utf-8") as file:
+        if __first_character(file) == "[":
+            records = __iter_json_array(file)
+            for chunk in __batch_records(records, chunk_size):
+                yield __format_chunk(chunk)
+            return
+
+    with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False) as reader:
+        for chunk in reader:
+            yield __format_chunk(chunk[COLUMNS])
+
+
+def get_smartmeter_data_paths() -> list[str]:
     """
-    read in the json data
-    
-    :param metaCheck: if true, read in metadata
-    :return: df containing data
+    paths of the json data, EXAMPLE_DATA may be a file, a glob pattern or a directory
+
+    :return: sorted absolute paths of the files
+    """
+
+    path = get_smartmeter_data_path()
+
+    if os.path.isdir(path):
+        path = os.path.join(path, "*.json*")
+
+    return sorted(glob.glob(path))
+
+
+def get_smartmeter_data_path(meta_check: bool = False) -> str:
+    """
+    path of the json data
+
+    :param meta_check: if true, path of the metadata
+    :return: absolute path of the file
     """
 
     load_dotenv()
@@ -38,9 +86,103 @@ def __read_smartmeter_data(meta_check: bool) -> pd.DataFrame:
         example_data = os.getenv("EXAMPLE_DATA")
         path = os.path.join(abs_path, example_data)
 
-    df = pd.read_json(path)
+    return path
+
+def __format_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    shorten the device names and parse the dates of a chunk
+
+    :param df: chunk with the columns dateObserved, refDevice and numValue
+    :return: formatted df
+    """
+
+    df = df.reset_index(drop=True)
+
+    # shorten name handle
+    load_dotenv()
+    device_prefix = os.getenv("DEVICE_PREFIX")
+    df["refDevice"] = df["refDevice"].astype(str).str.replace(device_prefix, "", regex=False)
+
+    # add timezone information (none, because of utc)
+    df["dateObserved"] = pd.to_datetime(df["dateObserved"], utc=True)
 
     return df
 
+def __batch_records(records: Iterator[dict[str, Any]], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    collect the used columns of records into dfs of chunk_size rows
+
+    :param records: parsed json objects
+    :param chunk_size: rows per df
+    :return: dfs with the columns dateObserved, refDevice and numValue
+    """
+
+    columns: dict[str, list] = {column: [] for column in COLUMNS}
+
+    for record in records:
+        for column in COLUMNS:
+            columns[column].append(record.get(column))
+
+        if len(columns["numValue"]) >= chunk_size:
+            yield pd.DataFrame(columns)
+            columns = {column: [] for column in COLUMNS}
+
+    if columns["numValue"]:
+        yield pd.DataFrame(columns)
+
+def __iter_json_array(file: IO[str], block_size: int = 1 << 20) -> Iterator[dict[str, Any]]:
+    """
+    parse the objects of a top level json array one by one,
+    the file is read in blocks so memory stays bounded by the block and object size
+
+    :param file: file positioned at the opening bracket
+    :param block_size: characters read at once
+    :return: parsed objects
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = file.read(block_size).lstrip()[1:]
+    position = 0
+    eof = False
+
+    while True:
+        position = __SEPARATORS.match(buffer, position).end()
+
+        # refill when the buffer is consumed or an object is cut at the block border
+        if position >= len(buffer) and not eof:
+            buffer, position = buffer[position:] + file.read(block_size), 0
+            eof = position >= len(buffer)
+            continue
+
+        if position >= len(buffer) or buffer[position] == "]":
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            block = file.read(block_size)
+            if not block:
+                raise
+            buffer, position = buffer[position:] + block, 0
+            continue
+
+        yield record
+
+def __first_character(file: IO[str]) -> str:
+    """
+    peek the first non whitespace character and rewind the file
+
+    :param file: opened file
+    :return: first character, empty if the file is empty
+    """
 
+    while True:
+        block = file.read(4096)
+        if not block:
+            file.seek(0)
+            return ""
 
+        stripped = block.lstrip()
+        if stripped:
+            file.seek(0)
+            return stripped[0]
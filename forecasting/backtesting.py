@@ -0,0 +1,120 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from warnings import simplefilter
+
+import numpy as np
+import pandas as pd
+
+from forecasting import model_training
+
+
+def create_cutoffs(n_observations: int, n_cutoffs: int, horizon: int, step: int) -> list[int]:
+    """
+    positions of the forecast origins, the last origin leaves exactly one horizon of observations
+
+    :param n_observations: length of the series
+    :param n_cutoffs: amount of forecast origins
+    :param horizon: periods forecasted at every origin
+    :param step: periods between two origins
+    :return: ascending positions, observations before a position are known at that origin
+    """
+
+    if n_cutoffs < 1 or horizon < 1 or step < 1:
+        raise ValueError("n_cutoffs, horizon and step have to be positive")
+
+    last = n_observations - horizon
+    cutoffs = [last - i * step for i in reversed(range(n_cutoffs))]
+
+    if cutoffs[0] < 2 * horizon:
+        raise ValueError(f"{n_observations} observations are too few for {n_cutoffs} cutoffs of {horizon} periods")
+
+    return cutoffs
+
+
+def run_backtest(values: np.ndarray, exogenous: np.ndarray | None,
+                 orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool] | None,
+                 cutoffs: list[int], horizon: int, workers: int) -> np.ndarray:
+    """
+    rolling origin evaluation, the cutoffs are split into contiguous blocks evaluated in parallel processes
+
+    :param values: observed series
+    :param exogenous: exogenous columns matching values row by row, None if plain
+    :param orders: (order, seasonal_order, with_intercept) to fit, None to search the orders in every block
+    :param cutoffs: ascending forecast origins
+    :param horizon: periods forecasted at every origin
+    :param workers: amount of processes
+    :return: forecasts of shape (cutoffs, horizon)
+    """
+
+    workers = max(1, min(workers, len(cutoffs)))
+    blocks = [list(block) for block in np.array_split(np.array(cutoffs), workers)]
+
+    if workers == 1:
+        return evaluate_block(values, exogenous, orders, blocks[0], horizon)
+
+    # spawn instead of fork, the caller may be multithreaded
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = executor.map(evaluate_block, *zip(*[(values, exogenous, orders, block, horizon) for block in blocks]))
+
+        return np.vstack(list(results))
+
+
+def evaluate_block(values: np.ndarray, exogenous: np.ndarray | None,
+                   orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool] | None,
+                   cutoffs: list[int], horizon: int) -> np.ndarray:
+    """
+    fit once at the first cutoff of the block, later cutoffs append the observations in between with update()
+
+    :param values: observed series
+    :param exogenous: exogenous columns matching values row by row, None if plain
+    :param orders: (order, seasonal_order, with_intercept) to fit, None to search the orders
+    :param cutoffs: ascending forecast origins of the block
+    :param horizon: periods forecasted at every origin
+    :return: forecasts of shape (cutoffs, horizon)
+    """
+
+    # ignore all future warnings
+    simplefilter(action='ignore', category=FutureWarning)
+
+    start_time = time.time()
+    forecasts = np.empty((len(cutoffs), horizon))
+
+    model, _ = model_training.train_model(pd.DataFrame({"value": values[:cutoffs[0]]}),
+                                          __exogenous(exogenous, 0, cutoffs[0]), orders, "fixed")
+
+    for i, cutoff in enumerate(cutoffs):
+        if i > 0:
+            previous = cutoffs[i - 1]
+            model.update(values[previous:cutoff], X=__exogenous(exogenous, previous, cutoff))
+
+        forecasts[i] = model.predict(n_periods=horizon, X=__exogenous(exogenous, cutoff, cutoff + horizon))
+
+    logging.debug(f"Block of {len(cutoffs)} cutoffs evaluated in {time.time() - start_time:.1f}s")
+
+    return forecasts
+
+
+def collect_actuals(values: np.ndarray, cutoffs: list[int], horizon: int) -> np.ndarray:
+    """
+    observed values following every cutoff
+
+    :param values: observed series
+    :param cutoffs: forecast origins
+    :param horizon: periods forecasted at every origin
+    :return: actuals of shape (cutoffs, horizon)
+    """
+
+    return values[np.asarray(cutoffs)[:, None] + np.arange(horizon)]
+
+
+def __exogenous(exogenous: np.ndarray | None, start: int, end: int) -> pd.DataFrame | None:
+    """
+    :param exogenous: exogenous columns, None if plain
+    :param start: first row
+    :param end: row after the last row
+    :return: rows of the exogenous columns as df, None if plain
+    """
+
+    return None if exogenous is None else pd.DataFrame(exogenous[start:end])
@@ -0,0 +1,95 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from warnings import simplefilter
+
+import numpy as np
+import pmdarima as pm
+
+
+def screen_columns(values: np.ndarray, candidates: dict[str, np.ndarray],
+                   orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool],
+                   holdout: int, workers: int) -> dict[str, Any]:
+    """
+    fit the same fixed orders once without and once per candidate column in parallel processes,
+    every fit forecasts the last holdout periods which were left out of the fit
+
+    :param values: observed series
+    :param candidates: exogenous columns by name, matching values row by row
+    :param orders: (order, seasonal_order, with_intercept) of every fit
+    :param holdout: periods at the end which are forecasted instead of fitted
+    :param workers: amount of processes
+    :return: baseline fit and candidate fits ranked by their error gain against the baseline
+    """
+
+    names = list(candidates)
+    columns = [None] + [candidates[name] for name in names]
+
+    # spawn instead of fork, the caller may be multithreaded
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(columns))),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(fit_candidate, values, column, orders, holdout) for column in columns]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"error": str(e)})
+
+    baseline, fits = results[0], results[1:]
+    if "error" in baseline:
+        raise ValueError(f"Fit without weather failed: {baseline['error']}")
+
+    ranking, failed = [], {}
+    for name, fit in zip(names, fits):
+        if "error" in fit:
+            failed[name] = fit["error"]
+            continue
+
+        fit["column"] = name
+        fit["errorGain"] = baseline["meanAbsoluteError"] - fit["meanAbsoluteError"]
+        fit["relativeErrorGain"] = (fit["errorGain"] / baseline["meanAbsoluteError"]
+                                    if baseline["meanAbsoluteError"] else None)
+        fit["aicGain"] = baseline["aic"] - fit["aic"]
+        ranking.append(fit)
+
+    ranking.sort(key=lambda fit: fit["errorGain"], reverse=True)
+
+    return {"baseline": baseline, "ranking": ranking, "failed": failed}
+
+
+def fit_candidate(values: np.ndarray, column: np.ndarray | None,
+                  orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool], holdout: int) -> dict[str, float]:
+    """
+    fit fixed orders without any search and forecast the holdout
+
+    :param values: observed series
+    :param column: exogenous column matching values row by row, None without weather
+    :param orders: (order, seasonal_order, with_intercept) to fit
+    :param holdout: periods at the end which are forecasted instead of fitted
+    :return: aic, mean absolute error of the holdout forecast and fit time
+    """
+
+    # ignore all future warnings
+    simplefilter(action='ignore', category=FutureWarning)
+
+    split = len(values) - holdout
+    exogenous = None if column is None else np.asarray(column, dtype=np.float64).reshape(-1, 1)
+
+    start_time = time.time()
+
+    order, seasonal_order, with_intercept = orders
+    model = pm.ARIMA(order=tuple(order), seasonal_order=tuple(seasonal_order), with_intercept=with_intercept,
+                     suppress_warnings=True)
+    model.fit(values[:split], X=None if exogenous is None else exogenous[:split])
+
+    fit_time = time.time() - start_time
+
+    forecast = model.predict(n_periods=holdout, X=None if exogenous is None else exogenous[split:])
+    mae = float(np.abs(np.asarray(forecast) - values[split:]).mean())
+
+    logging.debug(f"Fixed order fit in {fit_time:.1f}s, holdout MAE {mae}")
+
+    return {"aic": float(model.aic()), "meanAbsoluteError": mae, "fitTime": fit_time}
@@ -29,3 +29,29 @@ def calculate_metrics(real_values: list[float], forecast_values: pd.Series) -> p
 
     return df
 
+
+def calculate_horizon_metrics(real_values: np.ndarray, forecast_values: np.ndarray) -> dict[str, list[float | None]]:
+    """
+    error of every horizon step over all forecast origins of a backtest,
+    MAPE skips real values of zero, undefined metrics are None
+
+    :param real_values: observed values of shape (origins, horizon)
+    :param forecast_values: predicted values of shape (origins, horizon)
+    :return: dict of MAE, RMSE, R2 and MAPE lists with one entry per horizon step
+    """
+
+    errors = forecast_values - real_values
+
+    mae = np.abs(errors).mean(axis=0)
+    rmse = np.sqrt((errors ** 2).mean(axis=0))
+
+    total = ((real_values - real_values.mean(axis=0)) ** 2).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(total > 0, 1 - (errors ** 2).sum(axis=0) / total, np.nan)
+        relative = np.where(real_values != 0, np.abs(errors / real_values), np.nan)
+    mape = np.full(relative.shape[1], np.nan)
+    defined = ~np.isnan(relative).all(axis=0)
+    mape[defined] = np.nanmean(relative[:, defined], axis=0) * 100
+
+    return {name: [None if np.isnan(value) else float(value) for value in metric]
+            for name, metric in (("MAE", mae), ("RMSE", rmse), ("R2", r2), ("MAPE", mape))}
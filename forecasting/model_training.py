@@ -2,25 +2,41 @@ import logging
 import time
 from typing import Any
 
+import numpy as np
 import pmdarima as pm
 import pandas as pd
 
 from warnings import simplefilter
 
-def train_model(df: pd.DataFrame, weather_df: pd.DataFrame | None) -> tuple[Any, float]:
+def train_model(df: pd.DataFrame, weather_df: pd.DataFrame | np.ndarray | None,
+                orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool] | None = None,
+                warm_start: str = "fixed") -> tuple[Any, float]:
     """
-    train a model based on the data and exogen weather data
+    train a model based on the data and exogen weather data,
+    orders of a previous training skip the differencing tests and the order search
     
     :param df: smartmeter data
     :param weather_df: weather information
+    :param orders: (order, seasonal_order, with_intercept) of a previous training, None for a full search
+    :param warm_start: fixed to fit the known orders directly, seeded to start the stepwise search at them
     :return: trained model and set training time
     """
 
     # ignore all future warnings
     simplefilter(action='ignore', category=FutureWarning)
 
-    d_value = pm.arima.ndiffs(df["value"], test="adf")
-    D_value = pm.arima.nsdiffs(df['value'], m=24, test='ocsb')
+    if orders is not None and warm_start == "fixed":
+        model, training_time = __fit_known_orders(df, weather_df, orders)
+        if model is not None:
+            return model, training_time
+
+    if orders is not None:
+        # differencing of the previous training, the tests are skipped
+        (p, d_value, q), (P, D_value, Q, _), _ = orders
+    else:
+        p, q, P, Q = 2, 2, 1, 1
+        d_value = pm.arima.ndiffs(df["value"], test="adf")
+        D_value = pm.arima.nsdiffs(df['value'], m=24, test='ocsb')
     logging.debug(f"Optimal d: {d_value} and D: {D_value}, Start Training \n")
 
     start_time = time.time()
@@ -32,6 +48,8 @@ def train_model(df: pd.DataFrame, weather_df: pd.DataFrame | None) -> tuple[Any,
                           m=24,
                           seasonal=True,
                           d=d_value, D=D_value,
+                          start_p=p, start_q=q,
+                          start_P=P, start_Q=Q,
                           trace=1,
                           error_action='ignore',
                           suppress_warnings=True,
@@ -44,4 +62,59 @@ def train_model(df: pd.DataFrame, weather_df: pd.DataFrame | None) -> tuple[Any,
     logging.debug(f"Duration of training: {training_time}")
     logging.debug(model.summary())
 
-    return model, training_time
\ No newline at end of file
+    return model, training_time
+
+
+def __fit_known_orders(df: pd.DataFrame, weather_df: pd.DataFrame | np.ndarray | None,
+                       orders: tuple[tuple[int, int, int], tuple[int, int, int, int], bool]) -> tuple[Any, float]:
+    """
+    fit a model with fixed orders without any search
+
+    :param df: smartmeter data
+    :param weather_df: weather information
+    :param orders: (order, seasonal_order, with_intercept) to fit
+    :return: trained model and training time, model is None if the fit failed
+    """
+
+    order, seasonal_order, with_intercept = orders
+    logging.debug(f"Fitting known orders {order}{seasonal_order}, constant: {with_intercept}")
+
+    start_time = time.time()
+
+    try:
+        model = pm.ARIMA(order=tuple(order), seasonal_order=tuple(seasonal_order), with_intercept=with_intercept,
+                         suppress_warnings=True)
+        model.fit(df["value"], X=weather_df)
+    except Exception as e:
+        logging.debug(f"Fitting known orders failed, searching again: {e}")
+        return None, 0.0
+
+    training_time = time.time() - start_time
+    logging.debug(f"Duration of training: {training_time}")
+
+    return model, training_time
+
+
+def update_model(model: Any, df: pd.DataFrame, weather_df: pd.DataFrame | np.ndarray | None) -> tuple[Any, float]:
+    """
+    append new observations to a trained model keeping its order,
+    much faster than searching the order again with train_model
+
+    :param model: trained model
+    :param df: smartmeter data following the last trained observation
+    :param weather_df: weather information matching df row by row
+    :return: updated model and update time
+    """
+
+    # ignore all future warnings
+    simplefilter(action='ignore', category=FutureWarning)
+
+    start_time = time.time()
+    logging.debug(f"Start updating at: {start_time} with {len(df)} observations")
+
+    model.update(df["value"], X=weather_df)
+
+    update_time = time.time() - start_time
+    logging.debug(f"Duration of update: {update_time}")
+
+    return model, update_time
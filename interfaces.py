@@ -1,5 +1,7 @@
 import datetime
 from typing import TypedDict
+
+import numpy as np
 from pmdarima import ARIMA
 
 
@@ -26,6 +28,17 @@ class ForecastData(TypedDict):
     upper_conf_values: list[float]
     value: list[float]
 
+class BulkForecastData(TypedDict):
+    date: list[str]
+    failed: dict[str, str]
+    lower_conf_values: list[float]
+    nPeriods: int
+    name: list[str]
+    resolution: str
+    timeframe: str
+    upper_conf_values: list[float]
+    value: list[float]
+
 class FetchOneQueryDict(TypedDict):
     date: list[datetime.datetime]
     value: list[float]
@@ -34,6 +47,27 @@ class SelectDateValueData(TypedDict):
     date: list[datetime.datetime]
     value: list[float]
 
+class DateValueArrays(TypedDict):
+    date: np.ndarray
+    value: np.ndarray
+
+class TrainingJobData(TypedDict):
+    batch: str | None
+    duration: float | None
+    error: str | None
+    id: str
+    kind: str
+    modelKey: str | None
+    name: str
+    started: str | None
+    status: str
+    submitted: str
+
+class TrainingBatchData(TypedDict):
+    batchId: str
+    failed: dict[str, str]
+    jobs: dict[str, str]
+
 class ModelInfoDict(TypedDict):
     end_date: datetime
     model: ARIMA
@@ -0,0 +1,189 @@
+import datetime
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+GAP_FILL_POLICIES = ["bfill", "ffill", "interpolate", "zero", "none"]
+
+# dwd marks missing measurements with -999
+MISSING_SENTINEL = -999
+
+
+def to_hours(dates: np.ndarray | pd.Series | pd.DatetimeIndex | list) -> np.ndarray:
+    """
+    utc hours of timestamps, timezone aware dates are converted, naive dates are taken as utc
+
+    :param dates: timestamps
+    :return: datetime64[h] array, minutes and seconds are cut off
+    """
+
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+
+    return index.to_numpy().astype("datetime64[h]")
+
+
+def observed_range(dates: np.ndarray | pd.Series | pd.DatetimeIndex) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    first and last observed hour, an index clipped to them never fills in a head or tail which was not observed
+
+    :param dates: timestamps of the records, at least one
+    :return: utc datetimes of the first and last hour
+    """
+
+    hours = to_hours(dates)
+    first, last = hours.min(), hours.max()
+
+    return (pd.Timestamp(first).tz_localize("UTC").to_pydatetime(),
+            pd.Timestamp(last).tz_localize("UTC").to_pydatetime())
+
+
+def hourly_index(start: datetime.datetime | np.datetime64, end: datetime.datetime | np.datetime64) -> np.ndarray:
+    """
+    shared utc hourly index of a range
+
+    :param start: first date, cut off to its hour
+    :param end: last date, cut off to its hour
+    :return: datetime64[h] array from the first to the last hour
+    """
+
+    # converted one by one, start and end may differ in being timezone aware
+    first, last = to_hours([start])[0], to_hours([end])[0]
+
+    return np.arange(first, last + 1, dtype="datetime64[h]")
+
+
+def align(dates: np.ndarray | pd.Series | pd.DatetimeIndex, values: np.ndarray, start: datetime.datetime | np.datetime64,
+          end: datetime.datetime | np.datetime64, policy: str | None = None) -> np.ndarray:
+    """
+    reindex a series onto the hourly index of start to end in linear time,
+    values of the same hour are averaged, records outside the range are dropped
+    and missing hours are filled with the gap fill policy
+
+    :param dates: timestamps of the values
+    :param values: values of shape (records,) or (records, columns)
+    :param start: first hour of the index
+    :param end: last hour of the index
+    :param policy: gap fill policy, GAP_FILL (default bfill) if None
+    :return: float64 matrix of shape (hours, columns)
+    """
+
+    index = hourly_index(start, end)
+    values = np.asarray(values, dtype=np.float64).reshape(len(dates), -1)
+
+    if len(dates) == 0:
+        return fill_gaps(np.full((len(index), values.shape[1]), np.nan), policy)
+
+    positions = (to_hours(dates) - index[0]).astype(np.int64)
+    inside = (positions >= 0) & (positions < len(index))
+
+    matrix = np.empty((len(index), values.shape[1]))
+    for column in range(values.shape[1]):
+        valid = inside & ~np.isnan(values[:, column])
+        sums = np.bincount(positions[valid], weights=values[valid, column], minlength=len(index))
+        counts = np.bincount(positions[valid], minlength=len(index))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix[:, column] = np.where(counts > 0, sums / counts, np.nan)
+
+    return fill_gaps(matrix, policy)
+
+
+def fill_gaps(matrix: np.ndarray, policy: str | None = None) -> np.ndarray:
+    """
+    fill missing (NaN) hours column by column
+
+    bfill: next known value (previous known value at the end), ffill: previous known value (next known at the start),
+    interpolate: linear between the known values, zero: 0, none: missing hours are an error.
+    More missing hours than GAP_FILL_MAX_SHARE (default 0.5) of the index are an error with every policy
+
+    :param matrix: float64 matrix of shape (hours, columns)
+    :param policy: gap fill policy, GAP_FILL (default bfill) if None
+    :return: matrix without missing hours
+    """
+
+    policy = policy or read_policy()
+    if policy not in GAP_FILL_POLICIES:
+        raise ValueError(f"Unsupported gap fill policy {policy}")
+
+    missing = np.isnan(matrix)
+    if not missing.any():
+        return matrix
+
+    missing_hours = int(missing.any(axis=1).sum())
+    if policy == "none":
+        raise ValueError(f"{missing_hours} of {len(matrix)} hours are missing")
+    if missing_hours > read_max_fill_share() * len(matrix):
+        raise ValueError(f"{missing_hours} of {len(matrix)} hours are missing, too many to fill")
+    logging.debug(f"{missing_hours} of {len(matrix)} hours filled with {policy}")
+    if missing.all(axis=0).any():
+        raise ValueError("A column has no values in the range")
+    if policy == "zero":
+        return np.where(missing, 0.0, matrix)
+    if policy == "interpolate":
+        hours = np.arange(len(matrix))
+        filled = matrix.copy()
+        for column in np.flatnonzero(missing.any(axis=0)):
+            known = ~missing[:, column]
+            filled[:, column] = np.interp(hours, hours[known], matrix[known, column])
+        return filled
+
+    if policy == "bfill":
+        return __forward_fill(__forward_fill(matrix[::-1])[::-1])
+
+    return __forward_fill(__forward_fill(matrix)[::-1])[::-1]
+
+
+def check_length(matrix: np.ndarray | None, expected: int, name: str) -> None:
+    """
+    fail fast instead of silently shifting exogenous rows against the series
+
+    :param matrix: exogenous matrix, None if plain
+    :param expected: rows of the series
+    :param name: description of the matrix for the error
+    """
+
+    if matrix is not None and len(matrix) != expected:
+        raise ValueError(f"{name} has {len(matrix)} rows, expected {expected}")
+
+
+def read_policy() -> str:
+    """
+    :return: GAP_FILL policy, bfill by default
+    """
+
+    load_dotenv()
+
+    return os.getenv("GAP_FILL") or "bfill"
+
+
+def read_max_fill_share() -> float:
+    """
+    :return: GAP_FILL_MAX_SHARE, share of hours which may be filled, 0.5 by default
+    """
+
+    load_dotenv()
+    share = os.getenv("GAP_FILL_MAX_SHARE")
+
+    return float(share) if share else 0.5
+
+
+def __forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """
+    replace NaN by the last known value above it, leading NaN are kept
+
+    :param matrix: matrix of shape (hours, columns)
+    :return: filled matrix
+    """
+
+    known = ~np.isnan(matrix)
+    last_known = np.where(known, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(last_known, axis=0, out=last_known)
+
+    filled = matrix[last_known, np.arange(matrix.shape[1])]
+
+    # rows before the first known value pointed to row 0
+    return np.where(np.maximum.accumulate(known, axis=0), filled, np.nan)
@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+__session: requests.Session | None = None
+__session_lock = threading.Lock()
+
+# circuit breaker state
+__failures: int = 0
+__opened_at: float | None = None
+__breaker_lock = threading.Lock()
+
+
+class DWDUnavailableError(Exception):
+    """
+    raised when DWD can not be reached or the circuit breaker is open
+    """
+
+
+def get_json(url: str) -> dict[str, Any]:
+    """
+    GET a json document from DWD through the shared session,
+    with timeouts, retries with exponential backoff and a circuit breaker
+
+    :param url: url to request
+    :return: parsed json
+    """
+
+    __check_breaker()
+
+    connect_timeout, read_timeout = __read_timeouts()
+
+    try:
+        response = __get_session().get(url, timeout=(connect_timeout, read_timeout))
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        __record_failure()
+        raise DWDUnavailableError(f"DWD request {url} failed: {e}") from e
+
+    __record_success()
+
+    return data
+
+
+def get_timeseries(base_url: str, capability: str, unix_start: int, unix_end: int) -> list[dict[str, Any]]:
+    """
+    request the hourly timeseries of a capability, long ranges are split into chunks of DWD_CHUNK_DAYS
+    which are requested in parallel and merged back in order
+
+    :param base_url: dwd api url including the station
+    :param capability: kind of weather data
+    :param unix_start: first timestamp
+    :param unix_end: last timestamp
+    :return: timeseries entries ordered by timestamp
+    """
+
+    load_dotenv()
+    chunk_seconds = int(float(os.getenv("DWD_CHUNK_DAYS") or 90) * 86400)
+    workers = int(os.getenv("DWD_PARALLEL_REQUESTS") or 4)
+
+    chunks = [(start, min(start + chunk_seconds - 1, unix_end))
+              for start in range(unix_start, unix_end + 1, chunk_seconds)]
+
+    def request_chunk(chunk: tuple[int, int]) -> list[dict[str, Any]]:
+        data = get_json(base_url + f"/{capability}/hourly?from={chunk[0]}&until={chunk[1]}")
+        return data.get("timeseries") or []
+
+    if len(chunks) == 1:
+        return request_chunk(chunks[0])
+
+    logging.debug(f"Requesting {capability} in {len(chunks)} chunks")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(request_chunk, chunks))
+
+    # chunks do not overlap, but an entry on a border may be returned twice
+    records, seen = [], set()
+    for result in results:
+        for record in result:
+            if record.get("ts") not in seen:
+                seen.add(record.get("ts"))
+                records.append(record)
+
+    return records
+
+
+def get_breaker_state() -> dict[str, Any]:
+    """
+    state of the circuit breaker
+
+    :return: dict of consecutive failures and whether the breaker is open
+    """
+
+    with __breaker_lock:
+        return {"consecutiveFailures": __failures, "open": __opened_at is not None}
+
+
+def __check_breaker() -> None:
+    """
+    fail fast while the breaker is open, after DWD_BREAKER_COOLDOWN seconds one trial request is let through
+    """
+
+    global __opened_at
+
+    _, cooldown = __read_breaker_config()
+
+    with __breaker_lock:
+        if __opened_at is None:
+            return
+
+        if time.monotonic() - __opened_at < cooldown:
+            raise DWDUnavailableError("DWD circuit breaker is open")
+
+        # half open, this request is the trial, others keep failing fast until it succeeds
+        __opened_at = time.monotonic()
+        logging.debug("DWD circuit breaker half open")
+
+
+def __record_failure() -> None:
+    """
+    count a failed request and open the breaker after DWD_BREAKER_THRESHOLD consecutive failures
+    """
+
+    global __failures, __opened_at
+
+    threshold, _ = __read_breaker_config()
+
+    with __breaker_lock:
+        __failures += 1
+        if __failures >= threshold and __opened_at is None:
+            __opened_at = time.monotonic()
+            logging.error(f"DWD circuit breaker opened after {__failures} failures")
+
+
+def __record_success() -> None:
+    """
+    close the breaker after a successful request
+    """
+
+    global __failures, __opened_at
+
+    with __breaker_lock:
+        __failures = 0
+        __opened_at = None
+
+
+def __get_session() -> requests.Session:
+    """
+    shared session keeping connections to DWD alive, failed requests are retried with exponential backoff
+
+    :return: session
+    """
+
+    global __session
+
+    with __session_lock:
+        if __session is None:
+            load_dotenv()
+            retries = Retry(total=int(os.getenv("DWD_RETRIES") or 3),
+                            backoff_factor=float(os.getenv("DWD_BACKOFF") or 0.5),
+                            status_forcelist=[429, 500, 502, 503, 504],
+                            allowed_methods=["GET"])
+            pool_size = int(os.getenv("DWD_POOL_SIZE") or 10)
+
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+            __session = requests.Session()
+            __session.mount("http://", adapter)
+            __session.mount("https://", adapter)
+
+        return __session
+
+
+def __read_timeouts() -> tuple[float, float]:
+    """
+    :return: DWD_CONNECT_TIMEOUT and DWD_READ_TIMEOUT in seconds
+    """
+
+    load_dotenv()
+
+    return float(os.getenv("DWD_CONNECT_TIMEOUT") or 5), float(os.getenv("DWD_READ_TIMEOUT") or 60)
+
+
+def __read_breaker_config() -> tuple[int, float]:
+    """
+    :return: DWD_BREAKER_THRESHOLD failures and DWD_BREAKER_COOLDOWN in seconds
+    """
+
+    load_dotenv()
+
+    return int(os.getenv("DWD_BREAKER_THRESHOLD") or 5), float(os.getenv("DWD_BREAKER_COOLDOWN") or 60)
@@ -1,9 +1,11 @@
-import requests
+import numpy as np
 import pandas as pd
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pandas import json_normalize
 from dotenv import load_dotenv
+from weather import alignment, dwd_client, weather_cache
 
 
 def load_dwd_api() -> str | None:
@@ -27,8 +29,7 @@ def get_weather_capabilities(req_cols: bool) -> dict[str, list[str]]:
     :param req_cols: True when requesting all columns as well, false else
     :return: dict of weather capabilities
     """
-    response = requests.get(DWD_API)
-    data = response.json()
+    data = dwd_client.get_json(DWD_API)
     capabilities = {}
 
     min_date = pd.to_datetime("2021-05-26 00:00:00", utc=True)
@@ -60,110 +61,113 @@ def get_weather_capabilities(req_cols: bool) -> dict[str, list[str]]:
 
 def get_columns_of_weather(capabilities: dict[str,list[str]]) -> dict[str, list[str]]:
     """
-    request every column of every weather capability
+    request every column of every weather capability,
+    the capabilities are requested concurrently (WEATHER_CATALOG_WORKERS)
     
     :param capabilities: dict of capabilities
     :return: dict of capabilities with column entries
     """
-    MIN_DATE = pd.to_datetime("2021-05-26 00:00:00", utc=True)
-    unix_start = int(MIN_DATE.timestamp())
-    unix_end = int(unix_start + 60)
+    load_dotenv()
+    workers = int(os.getenv("WEATHER_CATALOG_WORKERS") or 8)
 
-    for capability in capabilities:
-        response = requests.get(
-            DWD_API + f"/{capability}/hourly?from={unix_start}&until={unix_end}")
-        data = response.json()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        columns = executor.map(__request_columns, list(capabilities))
 
-        if data.get("timeseries") and isinstance(data["timeseries"], list):
-            for column in data["timeseries"][0]:
-                logging.debug(f"{column} available")
-                capabilities[capability].append(column)
+        for capability, capability_columns in zip(list(capabilities), columns):
+            capabilities[capability].extend(capability_columns)
 
     return capabilities
 
 
 def get_columns_of_capability(capability: str) -> dict[str: list[str]]:
-    MIN_DATE = pd.to_datetime("2021-05-26 00:00:00", utc=True)
-    unix_start = int(MIN_DATE.timestamp())
-    unix_end = int(unix_start + 60)
-
     capability_dict = {"columns": []}
 
     if capability != "plain":
-
-        response = requests.get(
-            DWD_API + f"/{capability}/hourly?from={unix_start}&until={unix_end}")
-        data = response.json()
-
-        if data.get("timeseries") and isinstance(data["timeseries"], list):
-            for column in data["timeseries"][0]:
-                if column == "ts":
-                    continue
-                logging.debug(f"{column} available")
-                capability_dict["columns"].append(column)
-
+        capability_dict["columns"] = [column for column in __request_columns(capability) if column != "ts"]
     else:
         capability_dict["columns"] = ["No Weather Attribute chosen"]
 
     return capability_dict
 
 
+def __request_columns(capability: str) -> list[str]:
+    """
+    request the column names of a capability by reading its first entry
+
+    :param capability: kind of weather data
+    :return: column names including ts
+    """
+    MIN_DATE = pd.to_datetime("2021-05-26 00:00:00", utc=True)
+    unix_start = int(MIN_DATE.timestamp())
+    unix_end = int(unix_start + 60)
+
+    data = dwd_client.get_json(DWD_API + f"/{capability}/hourly?from={unix_start}&until={unix_end}")
+
+    columns = []
+    if data.get("timeseries") and isinstance(data["timeseries"], list):
+        for column in data["timeseries"][0]:
+            logging.debug(f"{column} available")
+            columns.append(column)
+
+    return columns
+
+
 def get_weather_data(capability: str, column: str, unix_start: int, unix_end: float) -> pd.DataFrame | None:
     """
-    request weather data from dwd
+    request weather data from dwd,
+    ranges already stored in the local weather cache are not requested again
     
     :param unix_start: start timestamp to search for
     :param unix_end: end timestamp to search for
     :param capability: kind of weather data to request
     :param column: column of capability to request
+    :raises DWDUnavailableError: if dwd could not be requested
+    :raises ValueError: if there is no weather data in the range
     """
-    df = pd.DataFrame()
 
     if capability == "plain":
         return None
 
-    try:
-        response = requests.get(
-            DWD_API + f"/{capability}/hourly?from={unix_start}&until={unix_end}"
-        )
-        data = response.json()
+    return get_weather_columns(capability, [column], unix_start, unix_end)
 
-        df = json_normalize(data["timeseries"])
-    except Exception as e:
-        logging.debug(f"DWD request failed, because: {e}")
 
-    # fill data spots inside weather data to fill in missing timestamps
-    df = __fill_missing_timestamps(df, column)
+def get_weather_columns(capability: str, columns: list[str], unix_start: int, unix_end: float) -> pd.DataFrame:
+    """
+    request multiple columns of one capability, the capability is requested or loaded only once
 
-    return df[[column, "ts"]]
+    :param capability: kind of weather data to request
+    :param columns: columns of capability to request
+    :param unix_start: start timestamp to search for
+    :param unix_end: end timestamp to search for
+    :return: df of the columns and ts with one row per hour of the range
+    :raises DWDUnavailableError: if dwd could not be requested
+    :raises ValueError: if there is no weather data in the range
+    """
 
+    unix_start, unix_end = int(unix_start), int(unix_end)
 
-def __fill_missing_timestamps(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
-    """
-    create missing timestamps in weather data in between start and end date
-    
-    :param df: df of weather info
-    :param column_name: column to check for missing data
-    :return:
-    """
+    for gap_start, gap_end in weather_cache.get_missing_ranges(capability, unix_start, unix_end):
+        records = dwd_client.get_timeseries(DWD_API, capability, gap_start, gap_end)
+        weather_cache.store(capability, gap_start, gap_end, records)
 
-    # Ensure the 'timestamp' column is in datetime format
-    df['ts'] = pd.to_datetime(df['ts'], format='%Y-%m-%dT%H:%M:%SZ')
+    df = json_normalize(weather_cache.load(capability, unix_start, unix_end))
 
-    # Create a date range from the first to the last timestamp in the DataFrame
-    all_timestamps = pd.date_range(start=df['ts'].min(), end=df['ts'].max(), freq='h')
-    all_timestamps_df = pd.DataFrame(all_timestamps, columns=['ts'])
+    missing = [column for column in columns if column not in df.columns]
+    if df.empty or missing:
+        raise ValueError(f"No {capability} data of columns {missing or columns} between {unix_start} and {unix_end}")
 
-    # Merge the new date range with the original DataFrame
-    df_filled = pd.merge(all_timestamps_df, df, on='ts', how='left')
+    values = df[columns].apply(pd.to_numeric, errors="raise").to_numpy(dtype=np.float64)
+    values[values == alignment.MISSING_SENTINEL] = np.nan
 
-    # backfill missing values (NaN)
-    df_filled = df_filled.bfill()
+    # reindex onto every hour of the range, missing hours and sentinels are filled by the gap fill policy
+    start = np.datetime64(unix_start, "s")
+    end = np.datetime64(unix_end, "s")
+    dates = pd.to_datetime(df["ts"], format="%Y-%m-%dT%H:%M:%SZ", utc=True)
 
-    # replaces every -999 as a statement for missing value with a 0 to not hinder prediction
-    df_filled[column_name] = df_filled[column_name].replace(-999, 0)
+    df_aligned = pd.DataFrame(alignment.align(dates, values, start, end), columns=columns)
+    df_aligned["ts"] = pd.DatetimeIndex(alignment.hourly_index(start, end)).tz_localize("UTC")
 
-    return df_filled
+    return df_aligned
 
 
 DWD_API: str|None = load_dwd_api()
@@ -0,0 +1,115 @@
+import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from weather import alignment, dwd_weather
+
+# separates multiple capabilities and columns of one model, e.g. air_temperature+precipitation and TT_TU+RS
+SEPARATOR = "+"
+
+
+class FeatureError(ValueError):
+    """
+    raised when the weather capabilities and columns of a request do not describe distinct features
+    """
+
+
+def parse_features(capability: str, column_name: str) -> list[tuple[str, str]]:
+    """
+    weather features of a model configuration, capability and column may list multiple entries joined by SEPARATOR
+
+    :param capability: capability of dwd weather, plain if none
+    :param column_name: column name of dwd data
+    :return: list of (capability, column), empty if plain
+    :raises FeatureError: if the amounts differ or a feature is listed twice
+    """
+
+    if capability == "plain":
+        return []
+
+    capabilities = capability.split(SEPARATOR)
+    columns = column_name.split(SEPARATOR)
+
+    if len(capabilities) != len(columns):
+        raise FeatureError(f"{len(capabilities)} capabilities do not match {len(columns)} columns")
+
+    features = list(zip(capabilities, columns))
+
+    # a duplicate would be selected as one block of columns and stacked as collinear exogenous columns
+    duplicates = sorted({f"{capability}/{column}" for capability, column in features
+                         if features.count((capability, column)) > 1})
+    if duplicates:
+        raise FeatureError(f"Weather features listed more than once: {', '.join(duplicates)}")
+
+    return features
+
+
+def join_features(capabilities: str | list[str], column_names: str | list[str]) -> tuple[str, str]:
+    """
+    configuration strings of multiple features as used in model keys
+
+    :param capabilities: capability or list of capabilities
+    :param column_names: column or list of columns in the same order
+    :return: joined capability and column
+    :raises FeatureError: if only one of them is a list or the lists differ in length
+    """
+
+    if isinstance(capabilities, str) and isinstance(column_names, str):
+        return capabilities, column_names
+
+    if isinstance(capabilities, str) or isinstance(column_names, str) or len(capabilities) != len(column_names):
+        raise FeatureError("Weather capabilities and columns have to be lists of the same length")
+
+    return SEPARATOR.join(capabilities), SEPARATOR.join(column_names)
+
+
+def build_matrix(capability: str, column_name: str, start_date: datetime.datetime,
+                 end_date: datetime.datetime) -> np.ndarray | None:
+    """
+    exogenous matrix of a model configuration, used for training and forecasting alike.
+    Every capability is requested once and concurrently and reindexed onto the utc hours of the range
+    (see alignment.align), the columns are returned as one contiguous float64 matrix in the order of the configuration
+
+    :param capability: capability of dwd weather, plain if none
+    :param column_name: column name of dwd data
+    :param start_date: first hour
+    :param end_date: last hour
+    :return: matrix of shape (hours of start to end, features), None if plain
+    """
+
+    features = parse_features(capability, column_name)
+    if not features:
+        return None
+
+    # columns grouped by capability, so every capability is requested once
+    columns_by_capability: dict[str, list[str]] = {}
+    for feature_capability, feature_column in features:
+        columns_by_capability.setdefault(feature_capability, []).append(feature_column)
+
+    def request(item: tuple[str, list[str]]) -> pd.DataFrame:
+        capability_name, columns = item
+        df = dwd_weather.get_weather_columns(capability_name, columns, int(start_date.timestamp()),
+                                             int(end_date.timestamp()))
+        df.columns = [f"{capability_name}{SEPARATOR}{column}" if column != "ts" else column for column in df.columns]
+        return df
+
+    load_dotenv()
+    workers = int(os.getenv("DWD_PARALLEL_REQUESTS") or 4)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(columns_by_capability)))) as executor:
+        frames = list(executor.map(request, columns_by_capability.items()))
+
+    # every capability is reindexed onto the same hours of the range, so the columns can be stacked
+    hours = len(alignment.hourly_index(start_date, end_date))
+    for frame in frames:
+        alignment.check_length(frame, hours, "Weather data")
+
+    columns = {column: frame[column].to_numpy(dtype=np.float64) for frame in frames for column in frame.columns
+               if column != "ts"}
+
+    return np.column_stack([columns[f"{feature_capability}{SEPARATOR}{feature_column}"]
+                            for feature_capability, feature_column in features])
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import pandas as pd
+from dotenv import load_dotenv
+from root_file import ROOT_DIR
+
+
+def get_missing_ranges(capability: str, unix_start: int, unix_end: int) -> list[tuple[int, int]]:
+    """
+    parts of the requested range which are not stored yet or have to be requested again,
+    hours younger than WEATHER_CACHE_REVISION_HOURS at request time are only valid for WEATHER_CACHE_TTL seconds
+
+    :param capability: kind of weather data
+    :param unix_start: first timestamp of the range
+    :param unix_end: last timestamp of the range
+    :return: sorted ranges (start, end) to request
+    """
+
+    ttl, revision_seconds = __read_config()
+    now = time.time()
+
+    with __connect() as connection:
+        rows = connection.execute("SELECT range_start, range_end, fetched FROM coverage WHERE capability=? AND range_start<=? "
+                                  "AND range_end>=? ORDER BY range_start", (capability, unix_end, unix_start)).fetchall()
+
+    valid_ranges = []
+    for start, end, fetched in rows:
+        if now - fetched > ttl:
+            # recent hours of an old request may have been revised since
+            end = min(end, int(fetched - revision_seconds))
+        if start <= end:
+            valid_ranges.append((start, end))
+
+    missing = []
+    position = unix_start
+    for start, end in sorted(valid_ranges):
+        if start > position:
+            missing.append((position, min(start - 1, unix_end)))
+        position = max(position, end + 1)
+        if position > unix_end:
+            break
+
+    if position <= unix_end:
+        missing.append((position, unix_end))
+
+    return missing
+
+
+def store(capability: str, unix_start: int, unix_end: int, records: list[dict[str, Any]]) -> None:
+    """
+    store requested records and mark the range as covered, replacing earlier records of the range.
+    An empty answer is not stored, the range stays missing and is requested again
+
+    :param capability: kind of weather data
+    :param unix_start: first timestamp of the requested range
+    :param unix_end: last timestamp of the requested range
+    :param records: timeseries entries returned by dwd
+    """
+
+    if not records:
+        logging.debug(f"No {capability} records between {unix_start} and {unix_end}, range not marked as covered")
+        return
+
+    rows = [(capability, int(pd.Timestamp(record["ts"]).timestamp()), json.dumps(record)) for record in records]
+
+    with __connect() as connection:
+        connection.execute("DELETE FROM observations WHERE capability=? AND ts BETWEEN ? AND ?",
+                           (capability, unix_start, unix_end))
+        connection.executemany("INSERT OR REPLACE INTO observations (capability, ts, data) VALUES (?, ?, ?)", rows)
+        connection.execute("DELETE FROM coverage WHERE capability=? AND range_start>=? AND range_end<=?",
+                           (capability, unix_start, unix_end))
+        connection.execute("INSERT INTO coverage (capability, range_start, range_end, fetched) VALUES (?, ?, ?, ?)",
+                           (capability, unix_start, unix_end, int(time.time())))
+
+    logging.debug(f"Stored {len(rows)} {capability} records between {unix_start} and {unix_end}")
+
+
+def load(capability: str, unix_start: int, unix_end: int) -> list[dict[str, Any]]:
+    """
+    stored records of a range
+
+    :param capability: kind of weather data
+    :param unix_start: first timestamp of the range
+    :param unix_end: last timestamp of the range
+    :return: timeseries entries ordered by timestamp
+    """
+
+    with __connect() as connection:
+        rows = connection.execute("SELECT data FROM observations WHERE capability=? AND ts BETWEEN ? AND ? ORDER BY ts",
+                                  (capability, unix_start, unix_end)).fetchall()
+
+    return [json.loads(row[0]) for row in rows]
+
+
+@contextmanager
+def __connect() -> Iterator[sqlite3.Connection]:
+    """
+    open the weather store of the configured station (FILE_PATH_WEATHER_CACHE/<station>.sqlite)
+
+    :return: sqlite connection, committed and closed afterwards
+    """
+
+    load_dotenv()
+    folder = os.path.join(ROOT_DIR, os.getenv("FILE_PATH_WEATHER_CACHE") or "files/weather_cache")
+    station = (os.getenv("WEATHER_STATION") or "station").strip("/")
+
+    os.makedirs(folder, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(folder, f"{station}.sqlite"), timeout=30)
+
+    try:
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS observations (capability TEXT NOT NULL, ts INTEGER NOT NULL, "
+                               "data TEXT NOT NULL, PRIMARY KEY (capability, ts))")
+            connection.execute("CREATE TABLE IF NOT EXISTS coverage (capability TEXT NOT NULL, range_start INTEGER NOT NULL, "
+                               "range_end INTEGER NOT NULL, fetched INTEGER NOT NULL)")
+            yield connection
+    finally:
+        connection.close()
+
+
+def __read_config() -> tuple[float, float]:
+    """
+    read WEATHER_CACHE_TTL and WEATHER_CACHE_REVISION_HOURS
+
+    :return: ttl of recent hours in seconds, revision window in seconds
+    """
+
+    load_dotenv()
+    ttl = os.getenv("WEATHER_CACHE_TTL")
+    revision_hours = os.getenv("WEATHER_CACHE_REVISION_HOURS")
+
+    return (float(ttl) if ttl else 3600.0,
+            (float(revision_hours) if revision_hours else 48.0) * 3600)
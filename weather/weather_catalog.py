@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from weather import dwd_weather
+
+__catalog: dict[str, list[str]] | None = None
+__built: float = 0.0
+__lock = threading.Lock()
+__refreshing = threading.Lock()
+
+
+def get_capabilities(columns: bool) -> dict[str, list[str]]:
+    """
+    weather capabilities served from the catalog
+
+    :param columns: if true -> also columns, false else
+    :return: dict of weather capabilities
+    """
+
+    catalog = __get_catalog()
+
+    if columns:
+        return {capability: list(capability_columns) for capability, capability_columns in catalog.items()}
+
+    return {capability: [] for capability in catalog}
+
+
+def get_columns_of_capability(capability: str) -> dict[str, list[str]]:
+    """
+    columns of a capability served from the catalog, unknown capabilities are requested from dwd
+
+    :param capability: str repr of capability
+    :return: dict with the list of columns
+    """
+
+    if capability == "plain":
+        return {"columns": ["No Weather Attribute chosen"]}
+
+    catalog = __get_catalog()
+
+    if capability not in catalog:
+        return dwd_weather.get_columns_of_capability(capability)
+
+    return {"columns": [column for column in catalog[capability] if column != "ts"]}
+
+
+def refresh() -> dict[str, list[str]]:
+    """
+    build the catalog of capabilities and their columns from dwd
+
+    :return: catalog
+    """
+
+    global __catalog, __built
+
+    start_time = time.time()
+    catalog = dwd_weather.get_weather_capabilities(True)
+
+    with __lock:
+        __catalog, __built = catalog, time.time()
+
+    logging.debug(f"Weather catalog of {len(catalog)} capabilities built in {time.time() - start_time}s")
+
+    return catalog
+
+
+def start_background_refresh() -> None:
+    """
+    build the catalog in the background and rebuild it every WEATHER_CATALOG_REFRESH seconds
+    """
+
+    def refresh_periodically():
+        while True:
+            __refresh_quietly()
+            time.sleep(__read_refresh_interval())
+
+    threading.Thread(target=refresh_periodically, name="weather-catalog", daemon=True).start()
+
+
+def __get_catalog() -> dict[str, list[str]]:
+    """
+    current catalog, built on first use, a stale catalog is served while it is rebuilt in the background
+
+    :return: catalog
+    """
+
+    with __lock:
+        catalog, built = __catalog, __built
+
+    if catalog is None:
+        return refresh()
+
+    if time.time() - built > __read_refresh_interval():
+        threading.Thread(target=__refresh_quietly, daemon=True).start()
+
+    return catalog
+
+
+def __refresh_quietly() -> None:
+    """
+    refresh the catalog unless another refresh is running, failures keep the previous catalog
+    """
+
+    if not __refreshing.acquire(blocking=False):
+        return
+
+    try:
+        refresh()
+    except Exception as e:
+        logging.debug(f"Refreshing weather catalog failed: {e}")
+    finally:
+        __refreshing.release()
+
+
+def __read_refresh_interval() -> float:
+    """
+    :return: WEATHER_CATALOG_REFRESH in seconds
+    """
+
+    load_dotenv()
+    interval = os.getenv("WEATHER_CATALOG_REFRESH")
+
+    return float(interval) if interval else 86400.0